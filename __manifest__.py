@@ -5,10 +5,16 @@
     "summary": "Gestión de cuentas y gastos personales",
     "author": "Jeffry Hernández",
     "depends": ["base", "account"],
+    "external_dependencies": {
+        "python": ["numpy"],
+    },
     "data": [
         "security/cashmind_groups.xml",
         "security/ir.model.access.csv",
+        "data/cashmind_cron.xml",
+        "data/cashmind_config.xml",
         "views/category_views.xml",
+        "views/category_rule_views.xml",
         "views/account_views.xml",
         "views/saving_goal_views.xml",
         "views/budget_views.xml",
@@ -17,9 +23,22 @@
         "views/transfer_views.xml",
         "views/transfer_external_views.xml",
         "views/save_views.xml",
+        "views/recurring_views.xml",
+        "views/sweep_rule_views.xml",
         "views/dashboard_views.xml",
+        "views/movement_views.xml",
+        "views/movement_export_views.xml",
+        "views/statement_import_views.xml",
+        "views/metric_views.xml",
+        "views/res_users_views.xml",
         "views/menu_views.xml",        
     ],
+    "assets": {
+        "web.assets_backend": [
+            "cashmind/static/src/js/dashboard_cards.js",
+            "cashmind/static/src/xml/dashboard_cards.xml",
+        ],
+    },
     "post_init_hook": "initial_config",
     "installable": True,
     "application": True,
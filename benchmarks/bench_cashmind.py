@@ -0,0 +1,406 @@
+"""Benchmark of the CashMind hot paths on synthetic data.
+
+Fills the database with N users x M accounts x K movements (in several currencies), with the exchange rate
+provider stubbed, and measures latency and SQL query count of:
+
+    expense_create, expense_write, expense_unlink_bulk, dashboard_recalculate, dashboard_kanban_read
+
+It also runs create/write/unlink on the nine cashmind models (single records, and bulk write/unlink of 100
+incomes and expenses) and, with --check, fails (exit code 1) when a scenario goes over its budget of SQL queries
+(the QUERY_COUNTS of the module tests, tests/test_query_counts.py) or of dashboard recalculations
+(RECALCULATION_BUDGETS). The budgets are upper bounds meant to catch O(records) regressions: lower them after a
+reference run, never raise them without a reason.
+
+The results are printed (or written to --output) as JSON, so they can be compared between versions.
+
+Usage (from a machine with Odoo and the cashmind module installed in the database):
+
+    python benchmarks/bench_cashmind.py -c /etc/odoo/odoo.conf -d cashmind_bench \\
+        --users 5 --accounts 3 --movements 500 --repeat 20 --output bench_output.json --check
+
+Everything runs in one transaction that is rolled back at the end, unless --keep is given.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import odoo
+from odoo import api, SUPERUSER_ID
+from odoo.modules.registry import Registry
+
+CURRENCIES = ["EUR", "USD", "GBP", "JPY"]
+# Fixed rates against EUR used by the stubbed provider
+RATES = {"EUR": 1.0, "USD": 1.08, "GBP": 0.85, "JPY": 160.0}
+BULK_UNLINK_SIZE = 100 # BULK_SIZE of tests/test_query_counts.py, so the counts are comparable
+
+MODELS = ["account", "category", "expense", "income", "transfer", "transfer_external", "save", "budget", "savinggoal"]
+# Max recalculate_dashboard() calls per call (transfers to another user also recalculate their dashboard)
+RECALCULATION_BUDGETS = {
+    **{f"{model}_{operation}": 1 for model in MODELS for operation in ("create", "write", "unlink")},
+    "transfer_external_create": 2,
+    "transfer_external_write": 2,
+    "expense_unlink_bulk": 1,
+    "income_write_bulk": 1,
+    "income_unlink_bulk": 1,
+    "dashboard_kanban_read": 0,
+}
+
+
+class StubResponse:
+    def __init__(self, url):
+        path, query = url.split("?", 1)
+        query = dict(part.split("=") for part in query.split("&"))
+        base, symbols = query["base"], query["symbols"].split(",")
+        rates = {s: RATES[s] / RATES[base] for s in symbols}
+        if ".." in path:
+            # Time series: the same rates every day of the range
+            date_from, date_to = (date.fromisoformat(d) for d in path.rsplit("/", 1)[1].split(".."))
+            days = (date_to - date_from).days + 1
+            self.payload = {"base": base, "rates": {
+                (date_from + timedelta(days=d)).isoformat(): rates for d in range(days)}}
+        else:
+            self.payload = {"base": base, "date": date.today().isoformat(), "rates": rates}
+
+    def json(self):
+        return self.payload
+
+
+@contextmanager
+def stub_rate_provider():
+    """Replaces the HTTP calls to the exchange rate API by the fixed RATES table (and counts them)."""
+    calls = []
+
+    def fake_get(url, *args, **kwargs):
+        calls.append(url)
+        return StubResponse(url)
+
+    with patch("odoo.addons.cashmind.utils.requests.get", side_effect=fake_get):
+        yield calls
+
+
+class Recorder:
+    """Collects wall time, SQL query count, HTTP calls and dashboard recalculations of every measured call."""
+
+    def __init__(self, cr, http_calls):
+        self.cr = cr
+        self.http_calls = http_calls
+        self.recalculations = 0
+        self.samples = {}
+
+    @contextmanager
+    def count_recalculations(self, env):
+        Dashboard = type(env["cashmind.dashboard"])
+        original = Dashboard.recalculate_dashboard
+        recorder = self
+
+        def recalculate_dashboard(self, *args, **kwargs):
+            recorder.recalculations += 1
+            return original(self, *args, **kwargs)
+
+        with patch.object(Dashboard, "recalculate_dashboard", recalculate_dashboard):
+            yield
+
+    @contextmanager
+    def measure(self, scenario):
+        queries = self.cr.sql_log_count
+        http_calls = len(self.http_calls)
+        recalculations = self.recalculations
+        start = time.perf_counter()
+        yield
+        # Pending writes are part of the operation
+        self.cr.flush()
+        elapsed = (time.perf_counter() - start) * 1000
+        self.samples.setdefault(scenario, []).append((
+            elapsed,
+            self.cr.sql_log_count - queries,
+            len(self.http_calls) - http_calls,
+            self.recalculations - recalculations,
+        ))
+
+    def results(self):
+        results = []
+        for scenario, samples in self.samples.items():
+            latencies = sorted(s[0] for s in samples)
+            queries = [s[1] for s in samples]
+            results.append({
+                "scenario": scenario,
+                "calls": len(samples),
+                "latency_ms": {
+                    "mean": round(statistics.mean(latencies), 3),
+                    "p50": round(percentile(latencies, 50), 3),
+                    "p95": round(percentile(latencies, 95), 3),
+                    "max": round(latencies[-1], 3),
+                },
+                "queries": {"mean": round(statistics.mean(queries), 2), "max": max(queries)},
+                "http_calls": {"mean": round(statistics.mean(s[2] for s in samples), 2)},
+                "recalculations": {"max": max(s[3] for s in samples)},
+            })
+        return results
+
+    def check_budgets(self):
+        """Scenarios over their query or recalculation budget, as readable messages."""
+        # Same table as the module tests (importable once the addons path is loaded)
+        from odoo.addons.cashmind.tests.test_query_counts import QUERY_COUNTS
+        violations = []
+        for result in self.results():
+            scenario = result["scenario"]
+            if result["queries"]["max"] > QUERY_COUNTS.get(scenario, float("inf")):
+                violations.append(f"{scenario}: {result['queries']['max']} queries "
+                                  f"(budget {QUERY_COUNTS[scenario]})")
+            if result["recalculations"]["max"] > RECALCULATION_BUDGETS.get(scenario, float("inf")):
+                violations.append(f"{scenario}: {result['recalculations']['max']} dashboard recalculations "
+                                  f"(budget {RECALCULATION_BUDGETS[scenario]})")
+        return violations
+
+
+def percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def generate_data(env, users, accounts, movements, seed):
+    """Creates the synthetic users, accounts, categories, movements and dashboards. Returns the users."""
+    rnd = random.Random(seed)
+    currencies = env["res.currency"].with_context(active_test=False).search([("name", "in", CURRENCIES)])
+    currencies.write({"active": True})
+    currency_ids = {c.name: c.id for c in currencies}
+    # Conversions only read the stored rates: store a year of rates of the stubbed provider
+    env["res.currency"]._cashmind_load_rate_history(CURRENCIES, date.today() - timedelta(days=365))
+    group = env.ref("cashmind.group_cashmind_user")
+    today = date.today()
+
+    created_users = env["res.users"]
+    for u in range(users):
+        user = env["res.users"].with_context(no_reset_password=True).create({
+            "name": f"Bench user {seed} {u}",
+            "login": f"bench_{seed}_{u}",
+            "groups_id": [(4, group.id), (4, env.ref("base.group_user").id)],
+        })
+        uenv = env(user=user.id)
+        # The dashboard is created with the user (res.users create)
+        uenv["cashmind.dashboard"].sudo().search([("user_id", "=", user.id)]).write({"currency_id": currency_ids["EUR"]})
+        expense_category = uenv["cashmind.category"].create({"name": "Compras", "category_type": "expense"})
+        income_category = uenv["cashmind.category"].create({"name": "Nomina", "category_type": "income"})
+        for a in range(accounts):
+            currency = CURRENCIES[a % len(CURRENCIES)]
+            account = uenv["cashmind.account"].create({
+                "name": f"Cuenta {a}",
+                "currency_id": currency_ids[currency],
+                "balance": 0.0,
+            })
+            incomes, expenses = [], []
+            for m in range(movements):
+                vals = {
+                    "user_id": user.id,
+                    "name": f"Movimiento {a} {m}",
+                    "account": account.id,
+                    "amount": round(rnd.uniform(1, 500), 2),
+                    "date": today - timedelta(days=rnd.randint(0, 365)),
+                }
+                if rnd.random() < 0.3:
+                    incomes.append(dict(vals, category=income_category.id))
+                else:
+                    expenses.append(dict(vals, category=expense_category.id))
+            uenv["cashmind.income"]._create_batch(incomes)
+            uenv["cashmind.expense"]._create_batch(expenses)
+            # Enough balance for every scenario
+            account.with_context(allow_balance_update=True, deny_notification=True).write({"balance": 10 ** 7})
+        uenv["cashmind.savinggoal"].create({
+            "name": "Meta bench",
+            "currency_id": currency_ids[CURRENCIES[0]],
+            "amount": 10 ** 9,
+            "start_date": (today - timedelta(days=30)).strftime("%Y-%m-%d"),
+            "limit_date": (today + timedelta(days=365)).strftime("%Y-%m-%d"),
+        })
+        created_users |= user
+    env.flush_all()
+    return created_users
+
+
+def run_scenarios(env, users, recorder, repeat):
+    today = date.today().strftime("%Y-%m-%d")
+    for user in users:
+        uenv = env(user=user.id)
+        Expense = uenv["cashmind.expense"]
+        account = uenv["cashmind.account"].search([("user_id", "=", user.id)], limit=1)
+        category = uenv["cashmind.category"].search([("user_id", "=", user.id), ("category_type", "=", "expense")],
+                                                    limit=1)
+        dashboard = uenv["cashmind.dashboard"].search([("user_id", "=", user.id)], limit=1)
+
+        for i in range(repeat):
+            with recorder.measure("expense_create"):
+                expense = Expense.create({
+                    "name": f"Bench gasto {i}",
+                    "account": account.id,
+                    "category": category.id,
+                    "amount": 1.0,
+                    "date": today,
+                })
+            with recorder.measure("expense_write"):
+                expense.write({"amount": 2.0})
+
+            bulk = Expense._create_batch([{
+                "user_id": user.id,
+                "name": f"Bench bulk {i} {n}",
+                "account": account.id,
+                "category": category.id,
+                "amount": 1.0,
+                "date": today,
+            } for n in range(BULK_UNLINK_SIZE)])
+            env.flush_all()
+            with recorder.measure("expense_unlink_bulk"):
+                bulk.unlink()
+
+            with recorder.measure("dashboard_recalculate"):
+                dashboard.recalculate_dashboard()
+                env.flush_all()
+
+            env.invalidate_all()
+            with recorder.measure("dashboard_kanban_read"):
+                read_kanban(uenv, user)
+
+
+def model_operations(env, users, recorder, repeat):
+    """create, write and unlink of one record of every cashmind model, plus bulk write/unlink of incomes."""
+    today = date.today()
+    today_str, tomorrow_str = today.strftime("%Y-%m-%d"), (today + timedelta(days=1)).strftime("%Y-%m-%d")
+    for u, user in enumerate(users):
+        uenv = env(user=user.id)
+        accounts = uenv["cashmind.account"].search([("user_id", "=", user.id)], order="id")
+        eur_account = accounts.filtered(lambda a: a.currency_id.name == CURRENCIES[0])[:1]
+        categories = uenv["cashmind.category"].search([("user_id", "=", user.id)])
+        expense_category = categories.filtered(lambda c: c.category_type == "expense")[:1]
+        income_category = categories.filtered(lambda c: c.category_type == "income")[:1]
+        goal = uenv["cashmind.savinggoal"].search([("user_id", "=", user.id)], limit=1)
+        other_user = users[(u + 1) % len(users)] if len(users) > 1 else None
+        other_account = (env["cashmind.account"].search([("user_id", "=", other_user.id)], limit=1)
+                         if other_user else None)
+
+        for i in range(repeat):
+            name = f"Bench {i}"
+            vals = {
+                "account": {"name": f"Bench cuenta {i}", "currency_id": eur_account.currency_id.id, "balance": 100.0},
+                "category": {"name": f"Bench categoria {i}", "category_type": "expense"},
+                "expense": {"name": name, "account": eur_account.id, "category": expense_category.id,
+                            "amount": 1.0, "date": today_str},
+                "income": {"name": name, "account": eur_account.id, "category": income_category.id,
+                           "amount": 1.0, "date": today_str},
+                "save": {"name": name, "source_account": eur_account.id, "destination_savinggoal_account": goal.id,
+                         "amount": 1.0, "date": today_str},
+                "budget": {"name": name, "account": eur_account.id, "category": expense_category.id,
+                           "amount": 1.0, "start_date": today_str, "end_date": tomorrow_str},
+                "savinggoal": {"name": name, "currency_id": eur_account.currency_id.id, "amount": 1000.0,
+                               "start_date": today_str, "limit_date": tomorrow_str},
+            }
+            if len(accounts) > 1:
+                vals["transfer"] = {"name": name, "source_account": accounts[0].id,
+                                    "destination_account": accounts[1].id, "amount": 1.0, "transfer_date": today_str}
+            if other_account:
+                vals["transfer_external"] = {"name": name, "external_user_id": other_user.id,
+                                             "source_account": eur_account.id,
+                                             "destination_account": other_account.id,
+                                             "amount": 1.0, "transfer_date": today_str}
+
+            for model in MODELS:
+                if model not in vals:
+                    continue
+                Model = uenv[f"cashmind.{model}"]
+                with recorder.measure(f"{model}_create"):
+                    record = Model.create(vals[model])
+                with recorder.measure(f"{model}_write"):
+                    record.write({"description": "Bench"} if model == "category" else {"note": "Bench"})
+                # External transfers can't be deleted (only archived)
+                if model != "transfer_external":
+                    with recorder.measure(f"{model}_unlink"):
+                        record.unlink()
+
+            incomes = uenv["cashmind.income"]._create_batch([
+                dict(vals["income"], user_id=user.id, name=f"Bench bulk {i} {n}") for n in range(BULK_UNLINK_SIZE)])
+            env.flush_all()
+            with recorder.measure("income_write_bulk"):
+                incomes.write({"note": "Bench"})
+            with recorder.measure("income_unlink_bulk"):
+                incomes.unlink()
+
+
+# Cards loaded by the dashboard widgets (CashmindDashboardCards: the summary and the sections, once visible)
+DASHBOARD_CARDS = ["summary", "expense", "income", "save", "transfer", "transfer_external"]
+
+
+def read_kanban(env, user):
+    """Same reads the web client does to render the dashboard: the kanban record, and its cards (they are not
+    fields of the view, the widgets load them with get_dashboard_cards)."""
+    Dashboard = env["cashmind.dashboard"]
+    view = Dashboard.get_views([(False, "kanban")])
+    fields = view["models"]["cashmind.dashboard"]
+    fields = fields.get("fields", fields)
+    records = Dashboard.web_search_read([("user_id", "=", user.id)], {name: {} for name in fields})
+    return records, Dashboard.get_dashboard_cards(DASHBOARD_CARDS, False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--config", help="Odoo configuration file")
+    parser.add_argument("-d", "--database", required=True)
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--movements", type=int, default=200, help="movements per account")
+    parser.add_argument("--repeat", type=int, default=10, help="calls per user and scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON file for the results (default: stdout)")
+    parser.add_argument("--keep", action="store_true", help="commit the synthetic data instead of rolling back")
+    parser.add_argument("--check", action="store_true", help="exit with code 1 if a scenario is over its budget")
+    args = parser.parse_args(argv)
+
+    odoo.tools.config.parse_config(["-c", args.config] if args.config else [])
+    registry = Registry(args.database)
+    with registry.cursor() as cr, stub_rate_provider() as http_calls:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        start = time.perf_counter()
+        users = generate_data(env, args.users, args.accounts, args.movements, args.seed)
+        generation_s = time.perf_counter() - start
+
+        recorder = Recorder(cr, http_calls)
+        with recorder.count_recalculations(env):
+            run_scenarios(env, users, recorder, args.repeat)
+            model_operations(env, users, recorder, args.repeat)
+        output = {
+            "meta": {
+                "database": args.database,
+                "odoo_version": odoo.release.version,
+                "users": args.users,
+                "accounts_per_user": args.accounts,
+                "movements_per_account": args.movements,
+                "repeat": args.repeat,
+                "seed": args.seed,
+                "generation_s": round(generation_s, 3),
+                "date": date.today().isoformat(),
+            },
+            "results": recorder.results(),
+            "violations": recorder.check_budgets(),
+        }
+        if args.keep:
+            cr.commit()
+        else:
+            cr.rollback()
+
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.check and output["violations"]:
+        print("\n".join(["Over budget:"] + output["violations"]), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+from odoo import http, api
+from odoo.http import request, content_disposition
+from odoo.modules.registry import Registry
+from ..models.movement import EXPORT_COLUMNS
+import csv
+import io
+import tempfile
+
+import logging
+_logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 64 * 1024  # Bytes sent to the client at a time for XLSX files
+
+
+class CashmindExport(http.Controller):
+
+    @http.route("/cashmind/export/movements", type="http", auth="user", methods=["GET"])
+    def export_movements(self, file_format="csv", date_from=None, date_to=None, **kwargs):
+        """Streams the whole movement history of the current user (all types of movement) as CSV or XLSX.
+
+        The response body is a generator: rows are read in chunks with a cursor of its own (the request cursor
+        is already closed when the body is sent) and written to the response as they are read.
+        """
+        file_format = "xlsx" if file_format == "xlsx" else "csv"
+        generator = self._generate_xlsx if file_format == "xlsx" else self._generate_csv
+        body = generator(request.env.cr.dbname, request.env.uid, dict(request.env.context),
+                         date_from or None, date_to or None)
+
+        filename = f"cashmind_movimientos.{file_format}"
+        content_type = ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" if file_format == "xlsx"
+                        else "text/csv; charset=utf-8")
+        response = request.make_response(body, headers=[
+            ("Content-Type", content_type),
+            ("Content-Disposition", content_disposition(filename)),
+        ])
+        response.direct_passthrough = True
+        return response
+
+    def _iter_chunks(self, dbname, uid, context, date_from, date_to):
+        with Registry(dbname).cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            yield from env["cashmind.movement"]._iter_export_rows(date_from=date_from, date_to=date_to)
+
+    def _generate_csv(self, dbname, uid, context, date_from, date_to):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue().encode("utf-8-sig")
+
+        for rows in self._iter_chunks(dbname, uid, context, date_from, date_to):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue().encode("utf-8")
+
+    def _generate_xlsx(self, dbname, uid, context, date_from, date_to):
+        import xlsxwriter
+
+        # XLSX is a zip file, so it can only be sent once it's closed. In constant_memory mode rows are flushed
+        # to disk as they are written, and the file is then streamed in small chunks
+        with tempfile.TemporaryFile() as file:
+            workbook = xlsxwriter.Workbook(file, {"constant_memory": True})
+            worksheet = workbook.add_worksheet("Movimientos")
+            date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+            worksheet.write_row(0, 0, EXPORT_COLUMNS)
+            row_index = 1
+            for rows in self._iter_chunks(dbname, uid, context, date_from, date_to):
+                for row in rows:
+                    worksheet.write_datetime(row_index, 0, row[0], date_format)
+                    worksheet.write_row(row_index, 1, row[1:])
+                    row_index += 1
+            workbook.close()
+
+            file.seek(0)
+            while True:
+                data = file.read(STREAM_CHUNK_SIZE)
+                if not data:
+                    break
+                yield data
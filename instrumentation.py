@@ -0,0 +1,184 @@
+"""Lightweight timing and query counters for the CashMind hot paths.
+
+Decorate a model method or a helper of utils.py with @instrumented. While the system parameter
+"cashmind.instrumentation" is "1", every call records its wall time, SQL queries and external HTTP calls (see
+count_http_call). Calls are aggregated per transaction (user and request) and, when the transaction commits,
+written to the log and to cashmind.metric. Nested calls are inclusive: the time of a create includes the
+update_balance and recalculate_dashboard it triggers.
+
+@profiled (on the entry points: create/write/unlink of the models and the dashboard write) is the opt-in
+profiler: for users with "cashmind_profiling" set, or calls with the context key "cashmind_profile", the call
+runs under cProfile while collecting every SQL query, and the report is stored as an ir.attachment of the user.
+"""
+import cProfile
+import functools
+import io
+import logging
+import pstats
+import threading
+import time
+from odoo import api, fields, SUPERUSER_ID
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+_local = threading.local()
+
+METRICS_KEY = "cashmind.metrics"
+# Lines of the cProfile report (functions sorted by cumulative time)
+PROFILE_STATS_LINES = 80
+
+
+def count_http_call():
+    """Called before every request to an external service (e.g. the exchange rate API)."""
+    _local.http_calls = getattr(_local, "http_calls", 0) + 1
+
+
+def _enabled(env):
+    # get_param is cached by the registry, so this doesn't cost a query per call
+    return env["ir.config_parameter"].sudo().get_param("cashmind.instrumentation") == "1"
+
+
+def instrumented(func):
+    """Records wall time, SQL queries and HTTP calls of every call of func (a model method or a helper function).
+
+    Methods are named "<model>.<method>", helpers by their function name. Helpers take the env from their first
+    argument (a record or an Environment); helpers without one are counted in the transaction of the
+    instrumented call that runs them.
+    """
+    is_method = "." in func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _local.__dict__.setdefault("stack", [])
+        env = getattr(args[0], "env", None) if args else None
+        if env is None and args and isinstance(args[0], api.Environment):
+            env = args[0]
+        if env is None:
+            if not stack:
+                return func(*args, **kwargs)
+            env = stack[-1]
+        elif not _enabled(env):
+            return func(*args, **kwargs)
+
+        name = f"{args[0]._name}.{func.__name__}" if is_method else func.__name__
+        cr = env.cr
+        queries = cr.sql_log_count
+        http_calls = getattr(_local, "http_calls", 0)
+        start = time.perf_counter()
+        stack.append(env)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stack.pop()
+            _record(env, name, (time.perf_counter() - start) * 1000, cr.sql_log_count - queries,
+                    getattr(_local, "http_calls", 0) - http_calls)
+
+    return wrapper
+
+
+def _record(env, name, duration_ms, queries, http_calls):
+    data = env.cr.precommit.data
+    metrics = data.get(METRICS_KEY)
+    if metrics is None:
+        metrics = data[METRICS_KEY] = {"uid": env.uid, "operations": {}}
+        env.cr.precommit.add(functools.partial(_flush, env))
+    operation = metrics["operations"].setdefault(name, [0, 0.0, 0, 0])
+    operation[0] += 1
+    operation[1] += duration_ms
+    operation[2] += queries
+    operation[3] += http_calls
+
+
+def _flush(env):
+    """Writes the metrics of the transaction: one log line and one cashmind.metric row per operation."""
+    metrics = env.cr.precommit.data.pop(METRICS_KEY, None)
+    if not metrics:
+        return
+    # Crons and other jobs run without an HTTP request
+    path = request.httprequest.path if request else "-"
+    operations = sorted(metrics["operations"].items(), key=lambda item: item[1][1], reverse=True)
+    _logger.info("cashmind metrics uid=%s request=%s %s", metrics["uid"], path, " | ".join(
+        f"{name} calls={calls} ms={duration:.1f} sql={queries} http={http_calls}"
+        for name, (calls, duration, queries, http_calls) in operations))
+    env["cashmind.metric"].sudo().create([{
+        "user_id": metrics["uid"],
+        "request": path,
+        "operation": name,
+        "calls": calls,
+        "duration_ms": duration,
+        "queries": queries,
+        "http_calls": http_calls,
+    } for name, (calls, duration, queries, http_calls) in operations])
+
+
+def _profiling_requested(env):
+    return env.context.get("cashmind_profile") or env.user.sudo().cashmind_profiling
+
+
+def profiled(func):
+    """Runs func under cProfile and records its SQL queries when profiling is requested (see module docstring).
+
+    Only the outermost profiled call of a thread is profiled: it already includes the nested ones.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if getattr(_local, "profiling", False) or not _profiling_requested(self.env):
+            return func(self, *args, **kwargs)
+
+        queries = []
+
+        def query_hook(cr, query, params, query_start, query_time, *args):
+            queries.append((query_time, query, params))
+
+        # Same hook the Odoo profiler uses: called by the cursor after every query of this thread
+        thread = threading.current_thread()
+        previous_hooks = getattr(thread, "query_hooks", None)
+        thread.query_hooks = list(previous_hooks or []) + [query_hook]
+        profile = cProfile.Profile()
+        _local.profiling = True
+        start = time.perf_counter()
+        try:
+            return profile.runcall(func, self, *args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            _local.profiling = False
+            if previous_hooks is None:
+                del thread.query_hooks
+            else:
+                thread.query_hooks = previous_hooks
+            _save_profile(self.env, f"{self._name}.{func.__name__}", duration, profile, queries)
+
+    return wrapper
+
+
+def _save_profile(env, operation, duration, profile, queries):
+    """Stores the report as a text attachment of the user, in its own transaction (kept even if the call fails)."""
+    stats = io.StringIO()
+    pstats.Stats(profile, stream=stats).sort_stats("cumulative").print_stats(PROFILE_STATS_LINES)
+    path = request.httprequest.path if request else "-"
+    lines = [
+        f"Operation: {operation}",
+        f"User: {env.uid}",
+        f"Request: {path}",
+        f"Date: {fields.Datetime.now()}",
+        f"Duration: {duration * 1000:.1f} ms",
+        f"SQL queries: {len(queries)} ({sum(q[0] for q in queries) * 1000:.1f} ms)",
+        "",
+        "=" * 30 + " cProfile " + "=" * 30,
+        stats.getvalue(),
+        "=" * 30 + " SQL " + "=" * 30,
+    ]
+    for query_time, query, params in queries:
+        lines.append(f"[{query_time * 1000:.2f} ms] {query} {params if params else ''}")
+
+    with env.registry.cursor() as cr:
+        api.Environment(cr, SUPERUSER_ID, {})["ir.attachment"].create({
+            "name": f"cashmind_profile_{operation}_{fields.Datetime.now():%Y%m%d_%H%M%S}.txt",
+            "raw": "\n".join(lines).encode(),
+            "mimetype": "text/plain",
+            "res_model": "res.users",
+            "res_id": env.uid,
+        })
+    _logger.info("cashmind profile stored for uid=%s operation=%s (%.1f ms, %s queries)",
+                 env.uid, operation, duration * 1000, len(queries))
@@ -1,5 +1,6 @@
 from . import account
 from . import category
+from . import category_rule
 from . import expense
 from . import income
 from . import transfer
@@ -7,4 +8,11 @@ from . import transfer_external
 from . import save
 from . import budget
 from . import saving_goal
+from . import recurring
+from . import sweep_rule
+from . import forecast
 from . import dashboard
+from . import movement
+from . import metric
+from . import res_users
+from . import res_currency
@@ -1,6 +1,7 @@
 from odoo import fields, models, api
 from odoo.exceptions import ValidationError
 from ..utils import notification, clean_input
+from ..instrumentation import instrumented, profiled
 
 class Account(models.Model):
     _name = "cashmind.account"
@@ -30,9 +31,10 @@ class Account(models.Model):
     
     @api.model
     def _default_currency(self):
-        currency = self.env["res.currency"].search([("name", "=", "EUR")], limit=1)
-        return currency.id if currency else False
+        return self.env["res.currency"]._cashmind_currency_id("EUR")
     
+    @profiled
+    @instrumented
     def create(self, vals):
         # Cleaning the name and description
         name = clean_input(vals["name"], "title") if "name" in vals else None
@@ -82,6 +84,8 @@ class Account(models.Model):
         return account
     
     
+    @profiled
+    @instrumented
     def write(self, vals):
         for rec in self:
             # Cleaning the name and description
@@ -166,6 +170,8 @@ class Account(models.Model):
 
         return account
 
+    @profiled
+    @instrumented
     def unlink(self):
         for rec in self:
             # Check if there are other models pointing to this one
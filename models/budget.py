@@ -1,7 +1,22 @@
 from odoo import fields, models, api
 from odoo.exceptions import ValidationError
 from datetime import datetime
+from collections import defaultdict
+from dateutil.relativedelta import relativedelta
 from ..utils import update_balance, notification, clean_input
+from ..instrumentation import instrumented, profiled
+import logging
+import re
+
+_logger = logging.getLogger(__name__)
+
+# Length of each period of a recurring budget
+BUDGET_PERIODS = {
+    "weekly": relativedelta(weeks=1),
+    "monthly": relativedelta(months=1),
+    "quarterly": relativedelta(months=3),
+    "yearly": relativedelta(years=1),
+}
 
 class Budget(models.Model):
     _name = "cashmind.budget"
@@ -27,6 +42,24 @@ class Budget(models.Model):
     note = fields.Text(string="Notas")
     active = fields.Boolean(string="Mostrar", default=True)
     expense_ids = fields.One2many("cashmind.expense", "budget", string="Gastos")
+    # Recurring budgets: a new period is opened automatically when end_date has passed
+    is_recurring = fields.Boolean(string="Recurrente")
+    period = fields.Selection([
+        ("weekly", "Semanal"),
+        ("monthly", "Mensual"),
+        ("quarterly", "Trimestral"),
+        ("yearly", "Anual"),
+        ], string="Período", default="monthly")
+    period_amount = fields.Monetary(string="Cantidad por período", currency_field="currency_id")
+    carry_over = fields.Boolean(string="Acumular sobrante")
+    state = fields.Selection([
+        ("open", "Abierto"),
+        ("closed", "Cerrado"),
+        ], string="Estado", default="open", required=True, index=True, copy=False)
+    previous_budget_id = fields.Many2one("cashmind.budget", string="Período anterior", readonly=True, copy=False)
+    # Alerts when the expended amount reaches these percentages of the budget (e.g. "80,100")
+    alert_thresholds = fields.Char(string="Alertas (%)", default="80,100")
+    last_alert_threshold = fields.Integer(string="Última alerta (%)", readonly=True, default=0, copy=False)
 
 
     @api.depends("amount", "expended")
@@ -49,9 +82,88 @@ class Budget(models.Model):
 
     @api.model
     def _default_currency(self):
-        currency = self.env["res.currency"].search([("name", "=", "EUR")], limit=1)
-        return currency.id if currency else False
+        return self.env["res.currency"]._cashmind_currency_id("EUR")
+
+    @api.constrains("alert_thresholds")
+    def _check_alert_thresholds_format(self):
+        for rec in self:
+            if rec.alert_thresholds and not re.fullmatch(r"\s*\d+(\s*,\s*\d+)*\s*", rec.alert_thresholds):
+                raise ValidationError("Las alertas deben ser porcentajes separados por comas, por ejemplo: 80,100.")
+
+    def _get_alert_thresholds(self):
+        self.ensure_one()
+        return sorted(int(t) for t in (self.alert_thresholds or "").split(",") if t.strip())
+
+    def _check_alert_thresholds(self):
+        """Incremental check, called by update_balance when expended changes.
+
+        Only the budgets given are checked. Crossed thresholds are queued and sent at commit time, so many
+        expenses in the same transaction produce one message per user.
+        """
+        alerts = []
+        for rec in self:
+            if not rec.amount:
+                continue
+            percentage = rec.expended * 100 / rec.amount
+            crossed = max([t for t in rec._get_alert_thresholds() if t <= percentage], default=0)
+            if crossed != rec.last_alert_threshold:
+                if crossed > rec.last_alert_threshold:
+                    alerts.append((rec.user_id.id, rec.name, percentage, crossed))
+                # Lower too if the expended amount decreased, so the threshold alerts again when reached
+                super(Budget, rec).write({"last_alert_threshold": crossed})
+        if alerts:
+            self._queue_budget_alerts(alerts)
+
+    @api.model
+    def _queue_budget_alerts(self, alerts):
+        """alerts: list of (user_id, budget name, percentage expended, threshold crossed)."""
+        pending = self.env.cr.precommit.data.setdefault("cashmind.budget_alerts", [])
+        if not pending:
+            self.env.cr.precommit.add(self._send_budget_alerts)
+        pending.extend(alerts)
+
+    @api.model
+    def _send_budget_alerts(self):
+        alerts = self.env.cr.precommit.data.pop("cashmind.budget_alerts", [])
+        by_user = defaultdict(dict)
+        for user_id, name, percentage, threshold in alerts:
+            # Only the last alert of each budget
+            by_user[user_id][name] = (percentage, threshold)
+        for user_id, budgets in by_user.items():
+            lines = [f"{name}: {percentage:.0f}% gastado (alerta del {threshold}%)"
+                     for name, (percentage, threshold) in budgets.items()]
+            notification(self.with_user(user_id), "Alertas de presupuesto", " | ".join(lines), "warning")
+
+    @api.model
+    def _cron_check_budget_alerts(self):
+        """Sweep of all the open budgets with one query: alerts for every threshold crossed and not yet alerted."""
+        self.env.flush_all()
+        self.env.cr.execute(f"""
+            SELECT b.id, b.user_id, b.name, b.expended * 100 / b.amount, t.crossed
+            FROM {self._table} b
+            CROSS JOIN LATERAL (
+                SELECT COALESCE(MAX(x), 0) AS crossed
+                FROM unnest(string_to_array(replace(b.alert_thresholds, ' ', ''), ',')::int[]) x
+                WHERE x <= b.expended * 100 / b.amount
+            ) t
+            WHERE b.active AND b.state = 'open' AND b.amount > 0 AND COALESCE(b.alert_thresholds, '') != ''
+              AND t.crossed > COALESCE(b.last_alert_threshold, 0)
+        """)
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return True
+        self.env.cr.execute(f"""
+            UPDATE {self._table} b SET last_alert_threshold = v.crossed
+            FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::int[]) AS crossed) v
+            WHERE b.id = v.id
+        """, ([row[0] for row in rows], [row[4] for row in rows]))
+        self.invalidate_model(["last_alert_threshold"])
+        self._queue_budget_alerts([(user_id, name, float(percentage), crossed)
+                                   for _, user_id, name, percentage, crossed in rows])
+        return True
     
+    @profiled
+    @instrumented
     def create(self, vals):
         if isinstance(vals, list):
             vals = vals[0]
@@ -93,6 +205,8 @@ class Budget(models.Model):
         vals["name"] = name.capitalize() if "name" in vals else None
         if note:
             vals["note"] = note
+        if vals.get("is_recurring") and not vals.get("period_amount"):
+            vals["period_amount"] = amount
 
         budget = super().create(vals)
         
@@ -110,6 +224,8 @@ class Budget(models.Model):
 
         return budget
     
+    @profiled
+    @instrumented
     def write(self, vals):
         for rec in self:
             # Cleaning the name and description
@@ -214,6 +330,95 @@ class Budget(models.Model):
         return budget
 
     
+    def _rollover_period(self):
+        """Closes the ended period of these budgets (all of them from the same account) and opens the next one.
+
+        The leftover balance of the closed period is released to the account, or carried to the new period if
+        carry_over is set, and the new period reserves period_amount. The account gets one net adjustment for all
+        the budgets, and the new periods are created with one INSERT, without the per-record create() side effects.
+        """
+        account = self.account
+        net = 0.00
+        vals_list = []
+        for rec in self:
+            name = rec.name
+            leftover = max(rec.balance, 0.00)
+            carried = leftover if rec.carry_over else 0.00
+            period_amount = rec.period_amount or rec.amount
+            start_date = rec.end_date + relativedelta(days=1)
+            end_date = start_date + BUDGET_PERIODS[rec.period or "monthly"] - relativedelta(days=1)
+
+            # Closed period: what's left goes back to the account (amount = expended, balance = 0), and it's
+            # renamed with its start date so the new period keeps the name
+            super(Budget, rec).write({
+                "state": "closed",
+                "amount": rec.expended,
+                "name": f"{rec.name} {rec.start_date}",
+            })
+            net += leftover - (period_amount + carried)
+            vals_list.append({
+                "user_id": rec.user_id.id,
+                "name": name,
+                "account": account.id,
+                "category": rec.category.id,
+                "currency_id": rec.currency_id.id,
+                "amount": period_amount + carried,
+                "expended": 0.00,
+                "start_date": start_date,
+                "end_date": end_date,
+                "note": rec.note,
+                "is_recurring": True,
+                "period": rec.period,
+                "period_amount": period_amount,
+                "carry_over": rec.carry_over,
+                "previous_budget_id": rec.id,
+            })
+        new_budgets = super().create(vals_list)
+        if net:
+            update_balance(account, net)
+        return new_budgets
+
+    @api.model
+    def _cron_rollover_budgets(self, batch_size=500, auto_commit=True):
+        """Opens the next period of every recurring budget whose end_date has passed, batch_size at a time.
+
+        Budgets several periods behind are caught up one period per loop. Accounts without enough balance for
+        the new periods are left as they are (and retried on the next run).
+        """
+        today = fields.Date.context_today(self)
+        Budgets = self.sudo()
+        failed_ids = []
+        while True:
+            budgets = Budgets.search([
+                ("is_recurring", "=", True),
+                ("state", "=", "open"),
+                ("end_date", "<", today),
+                ("id", "not in", failed_ids)], limit=batch_size, order="end_date, id")
+            if not budgets:
+                break
+
+            by_account = defaultdict(lambda: Budgets.browse())
+            for budget in budgets:
+                by_account[budget.account] |= budget
+            user_ids = set()
+            for account, account_budgets in by_account.items():
+                try:
+                    with self.env.cr.savepoint():
+                        account_budgets._rollover_period()
+                        user_ids.add(account.user_id.id)
+                except ValidationError as e:
+                    _logger.warning("Budget rollover failed for account %s: %s", account.id, e)
+                    failed_ids += account_budgets.ids
+
+            # Recalculate dashboard stats, once per user for the whole batch
+            dashboards = self.env["cashmind.dashboard"].sudo().search([("user_id", "in", list(user_ids))])
+            dashboards.recalculate_dashboard()
+            if auto_commit:
+                self.env.cr.commit()
+        return True
+
+    @profiled
+    @instrumented
     def unlink(self):
         for rec in self:
             # Check if there are other models pointing to this one
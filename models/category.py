@@ -1,6 +1,7 @@
 from odoo import fields, models, api
 from odoo.exceptions import ValidationError
 from ..utils import notification, clean_input
+from ..instrumentation import instrumented, profiled
 
 class Category(models.Model):
     _name = "cashmind.category"
@@ -35,6 +36,8 @@ class Category(models.Model):
     def _onchange_category_type(self):
         self.parent_id = False
 
+    @profiled
+    @instrumented
     def create(self, vals):
         name = clean_input(vals["name"], "title") if "name" in vals else None
         name = name.lower() if name else None
@@ -91,6 +94,8 @@ class Category(models.Model):
         return category
 
     
+    @profiled
+    @instrumented
     def write(self, vals):
         for rec in self:
             # Cleaning the name and description
@@ -200,6 +205,8 @@ class Category(models.Model):
         return category
 
 
+    @profiled
+    @instrumented
     def unlink(self): 
         for rec in self:
             # Check if there are other models pointing to this one
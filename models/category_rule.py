@@ -0,0 +1,143 @@
+import re
+from odoo import fields, models, api, tools
+from odoo.exceptions import ValidationError
+from ..utils import clean_input
+
+
+class CategoryMatcher:
+    """All the categorization rules of a user, compiled once.
+
+    The keywords and regular expressions of every rule are joined in a single regex made of optional lookaheads
+    (one named group per rule), so one regex call per description tells which rules match it. Only those rules
+    are then checked against the amount and account conditions, in order of priority.
+    """
+
+    def __init__(self, rules):
+        # rules: list of (rule_id, category_id, movement_type, pattern, amount_min, amount_max, account_id),
+        # already sorted by priority
+        self.rules = rules
+        lookaheads = [f"(?=.*?(?P<r{rule[0]}>{rule[3]}))?" for rule in rules]
+        self.regex = re.compile("".join(lookaheads), re.IGNORECASE | re.DOTALL) if rules else None
+
+    def match(self, description, amount, account_id=False, movement_type="expense"):
+        """Returns the category id of the first rule matching the movement, or False."""
+        if not self.regex:
+            return False
+        groups = self.regex.match(description or "").groupdict()
+        amount = abs(amount or 0.0)
+        for rule_id, category_id, rule_type, _, amount_min, amount_max, rule_account_id in self.rules:
+            if groups[f"r{rule_id}"] is None:
+                continue
+            if rule_type not in (movement_type, "NA"):
+                continue
+            if (amount_min and amount < amount_min) or (amount_max and amount > amount_max):
+                continue
+            if rule_account_id and rule_account_id != account_id:
+                continue
+            return category_id
+        return False
+
+
+class CategoryRule(models.Model):
+    _name = "cashmind.category_rule"
+    _order = "sequence, id"
+
+    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", index=True,
+                              default=lambda self: self.env.user)
+    name = fields.Char(string="Regla", required=True)
+    sequence = fields.Integer(string="Prioridad", default=10)
+    category = fields.Many2one("cashmind.category", string="Categoría", required=True, ondelete="cascade",
+                               domain="[('user_id', '=', uid)]")
+    movement_type = fields.Selection(related="category.category_type", string="Tipo de movimiento", store=True)
+    keyword = fields.Char(string="Palabra clave")
+    regex = fields.Char(string="Expresión regular")
+    amount_min = fields.Float(string="Importe mínimo")
+    amount_max = fields.Float(string="Importe máximo")
+    account = fields.Many2one("cashmind.account", string="Cuenta", ondelete="cascade", domain="[('user_id', '=', uid)]")
+    active = fields.Boolean(string="Mostrar", default=True)
+
+    @api.constrains("keyword", "regex", "amount_min", "amount_max", "account")
+    def _check_rule(self):
+        for rec in self:
+            if not (rec.keyword or rec.regex or rec.amount_min or rec.amount_max or rec.account):
+                raise ValidationError("La regla debe tener al menos una condición: palabra clave, expresión regular, "
+                                      "importe o cuenta.")
+            if rec.amount_min < 0 or rec.amount_max < 0:
+                raise ValidationError("Los importes de la regla no pueden ser negativos.")
+            if rec.amount_max and rec.amount_min > rec.amount_max:
+                raise ValidationError("El importe mínimo no puede ser mayor que el importe máximo.")
+            if rec.regex:
+                try:
+                    # Compiled the same way it's used inside the combined regex of the matcher, next to another
+                    # rule, so inline flags or group references that only break the combined regex are caught
+                    pattern = rec._rule_pattern(rec.keyword, rec.regex)
+                    re.compile(f"(?=.*?(?P<r0>{pattern}))?(?=.*?(?P<r1>x))?")
+                    groups = re.compile(rec.regex).groups
+                except re.error as e:
+                    raise ValidationError(f"La expresión regular no es válida: {e}")
+                if groups:
+                    # Each rule is a named group of the combined regex: the groups of the rule would shift the
+                    # numbers of the others and break its backreferences
+                    raise ValidationError("La expresión regular no puede contener grupos de captura ni referencias "
+                                          "a grupos. Utiliza grupos sin captura: (?:...)")
+
+    @api.model
+    def _rule_pattern(self, keyword, regex):
+        """Pattern of a rule: the keyword (literal) and/or the regex; both must match when both are given."""
+        parts = []
+        if keyword:
+            parts.append(re.escape(keyword.strip()))
+        if regex:
+            parts.append(f"(?:{regex})")
+        if not parts:
+            return ""
+        if len(parts) == 1:
+            return parts[0]
+        return f"(?=.*?{parts[0]}).*?{parts[1]}"
+
+    @api.model
+    def _get_matcher(self, user_id):
+        """Compiled matcher of the active rules of a user.
+
+        The rules are read on every call (a single query) and the compiled matcher is cached by their content,
+        so creating, changing, archiving or deleting a rule or a category never serves a stale matcher.
+        """
+        self.flush_model(["user_id", "sequence", "category", "keyword", "regex", "amount_min", "amount_max",
+                          "account", "active"])
+        self.env["cashmind.category"].flush_model(["category_type", "active"])
+        self.env.cr.execute(f"""
+            SELECT r.id, r.category, c.category_type, r.keyword, r.regex, r.amount_min, r.amount_max, r.account
+            FROM {self._table} r
+            JOIN cashmind_category c ON c.id = r.category
+            WHERE r.user_id = %s AND r.active AND c.active
+            ORDER BY r.sequence, r.id
+        """, (user_id,))
+        rules = [
+            (rule_id, category_id, category_type, self._rule_pattern(keyword, regex),
+             amount_min or 0.0, amount_max or 0.0, account_id or False)
+            for rule_id, category_id, category_type, keyword, regex, amount_min, amount_max, account_id
+            in self.env.cr.fetchall()
+        ]
+        return self._compile_matcher(tuple(rules))
+
+    @tools.ormcache("rules")
+    def _compile_matcher(self, rules):
+        return CategoryMatcher(list(rules))
+
+    @api.model
+    def match_category(self, description, amount, account_id=False, movement_type="expense"):
+        """Category id for a movement of the current user according to their rules, or False."""
+        matcher = self._get_matcher(self.env.uid)
+        return matcher.match(description, amount, account_id, movement_type)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get("name"):
+                vals["name"] = clean_input(vals["name"], "title").capitalize()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if vals.get("name"):
+            vals["name"] = clean_input(vals["name"], "title").capitalize()
+        return super().write(vals)
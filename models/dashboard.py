@@ -1,10 +1,39 @@
+import numpy as np
 from odoo import fields, models, api
+from odoo.exceptions import UserError
+from odoo.tools import format_amount, split_every
 from lxml import etree
-from ..utils import get_current_month_range, get_last_month_range, convert_currencies
+from collections import defaultdict
+from ..utils import get_current_month_range, get_last_month_range, sorted_by_value, top1, variation
+from ..instrumentation import instrumented, profiled
 
 import logging
 _logger = logging.getLogger(__name__)
 
+# Fields returned by get_dashboard_cards() for every card. "summary" is the first paint of the dashboard, the rest
+# of the cards (and their JSON breakdowns) are only read when the user opens them
+DASHBOARD_CARDS = {
+    "summary": ["total_amount", "total_account", "total_budget", "total_savinggoal"],
+    "expense": ["total_expense_month", "difference_expense", "category_expense_top1_name", "category_expense_top1_value",
+                "difference_category_expense_top1"],
+    "income": ["total_income_month", "difference_income", "category_income_top1_name", "category_income_top1_value",
+               "difference_category_income_top1"],
+    "save": ["total_save_month", "difference_save", "save_top1_name", "save_top1_value", "difference_save_top1"],
+    "transfer": ["total_transfer_month", "difference_transfer", "transfer_top1_name", "transfer_top1_value",
+                 "difference_transfer_top1"],
+    "transfer_external": ["total_transfer_external_sent_month", "difference_transfer_ext_sent",
+                          "total_transfer_external_received_month", "difference_transfer_ext_received"],
+}
+# JSON {name: value} maps with the full breakdown of a card
+DASHBOARD_BREAKDOWNS = {
+    "expense": "total_expense_cat_month",
+    "income": "total_income_cat_month",
+    "save": "total_save_name_value",
+    "transfer": "total_transfer_name_value",
+}
+# Dashboards created (and computed) together when provisioning users
+PROVISIONING_BATCH_SIZE = 1000
+
 
 class Dashboard(models.Model):
     _name = "cashmind.dashboard"
@@ -12,7 +41,15 @@ class Dashboard(models.Model):
     name = "MI DASHBOARD"
     user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", unique=True,
                               default=lambda self: self.env.user)
-    currency_id = fields.Many2one("res.currency", required=True, default=125)
+    currency_id = fields.Many2one("res.currency", required=True, default=lambda self: self._default_currency())
+    # Conversion state of the last recalculation: amounts in a currency without any known rate are left out until
+    # the rates cron downloads it (pending), and old rates are still used but shown as outdated (stale)
+    rates_pending = fields.Boolean(string="Conversión pendiente", readonly=True)
+    # Same for the movements of the month stats, converted at the rate of their own date
+    month_rates_pending = fields.Boolean(string="Conversión pendiente (mes)", compute="_compute_month_stats",
+                                         store=True)
+    rates_date = fields.Date(string="Fecha del tipo de cambio", readonly=True)
+    rates_stale = fields.Boolean(string="Tipo de cambio desactualizado", compute="_compute_rates_stale")
         
     # CURRENT TOTALS 
     total_savinggoal = fields.Monetary(currency_field="currency_id")
@@ -21,722 +58,422 @@ class Dashboard(models.Model):
     total_amount = fields.Monetary(currency_field="currency_id", compute="_compute_current_total_amount", store=True)
     
     # CURRENT MONTH TOTAL VARIABLES
-    total_save_month = fields.Monetary(currency_field="currency_id", compute="_compute_save_month_stats", store=True)
-    total_income_month = fields.Monetary(currency_field="currency_id", compute="_compute_income_month_stats", store=True)
-    total_expense_month = fields.Monetary(currency_field="currency_id", compute="_compute_expense_month_stats", store=True)
-    total_transfer_month = fields.Monetary(currency_field="currency_id", compute="_compute_transfer_month_stats", store=True)
-    total_transfer_external_sent_month = fields.Monetary(currency_field="currency_id", compute="_compute_transfer_external_sent_month_stats", store=True)
-    total_transfer_external_received_month = fields.Monetary(currency_field="currency_id", compute="_compute_transfer_external_received_month_stats", store=True)
-    
+    # Every stat below is produced by _compute_month_stats in a single pass and stored, so reading the dashboard
+    # is a plain row fetch
+    total_save_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    total_income_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    total_expense_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    total_transfer_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    total_transfer_external_sent_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    total_transfer_external_received_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+
     # Categories (for small cards under total month income and total month expense)
-    total_income_cat_month = fields.Json(compute="_compute_income_month_stats", store=True) # {category_name: category_value} All the categories and its values
-    total_expense_cat_month = fields.Json(compute="_compute_expense_month_stats", store=True) # {category_name: category_value} All the categories and its values
-    category_income_top1 = fields.Json(compute="_compute_top1_income_cat", store=True) # {category_name: "name", category_value: value}
-    category_expense_top1 = fields.Json(compute="_compute_top1_expense_cat", store=True) # {category_name: "name", category_value: value}
+    total_income_cat_month = fields.Json(compute="_compute_month_stats", store=True) # {category_name: category_value} All the categories and its values
+    total_expense_cat_month = fields.Json(compute="_compute_month_stats", store=True) # {category_name: category_value} All the categories and its values
+    category_income_top1 = fields.Json(compute="_compute_month_stats", store=True) # {category_name: "name", category_value: value}
+    category_expense_top1 = fields.Json(compute="_compute_month_stats", store=True) # {category_name: "name", category_value: value}
     # To show on dashboard (with monetary format, instead float from the json)
-    category_income_top1_name = fields.Char(compute="_compute_top1_income_cat_name_value")
-    category_income_top1_value = fields.Monetary(compute="_compute_top1_income_cat_name_value", currency_field="currency_id")
+    category_income_top1_name = fields.Char(compute="_compute_month_stats", store=True)
+    category_income_top1_value = fields.Monetary(compute="_compute_month_stats", store=True, currency_field="currency_id")
     # To show on dashboard (with monetary format, instead float from the json)
-    category_expense_top1_name = fields.Char(compute="_compute_top1_expense_cat_name_value")
-    category_expense_top1_value = fields.Monetary(compute="_compute_top1_expense_cat_name_value", currency_field="currency_id")
+    category_expense_top1_name = fields.Char(compute="_compute_month_stats", store=True)
+    category_expense_top1_value = fields.Monetary(compute="_compute_month_stats", store=True, currency_field="currency_id")
 
     # Save (for small card under total month save)
-    total_save_name_value = fields.Json(compute="_compute_save_month_stats", store=True) # {save_name: save_value} All the saves and its values
-    save_top1 = fields.Json(compute="_compute_top1_save", store=True) # {save_name: "name", save_value: value}
+    total_save_name_value = fields.Json(compute="_compute_month_stats", store=True) # {save_name: save_value} All the saves and its values
+    save_top1 = fields.Json(compute="_compute_month_stats", store=True) # {save_name: "name", save_value: value}
     # To show on dashboard (with monetary format, instead float from the json)
-    save_top1_name = fields.Char(compute="_compute_top1_save_name_value")
-    save_top1_value = fields.Monetary(compute="_compute_top1_save_name_value", currency_field="currency_id")
+    save_top1_name = fields.Char(compute="_compute_month_stats", store=True)
+    save_top1_value = fields.Monetary(compute="_compute_month_stats", store=True, currency_field="currency_id")
 
     # Transfer (for small card under total month transfer)
-    total_transfer_name_value = fields.Json(compute="_compute_transfer_month_stats", store=True) # {transfer_name: transfer_value} All the transfer and its values
-    transfer_top1 = fields.Json(compute="_compute_top1_transfer", store=True) # {transfer_name: "name", transfer_value: value}
+    total_transfer_name_value = fields.Json(compute="_compute_month_stats", store=True) # {transfer_name: transfer_value} All the transfer and its values
+    transfer_top1 = fields.Json(compute="_compute_month_stats", store=True) # {transfer_name: "name", transfer_value: value}
     # To show on dashboard (with monetary format, instead float from the json)
-    transfer_top1_name = fields.Char(compute="_compute_top1_transfer_name_value")
-    transfer_top1_value = fields.Monetary(compute="_compute_top1_transfer_name_value", currency_field="currency_id")
+    transfer_top1_name = fields.Char(compute="_compute_month_stats", store=True)
+    transfer_top1_value = fields.Monetary(compute="_compute_month_stats", store=True, currency_field="currency_id")
 
     # LAST MONTH TOTAL VARIABLES
-    total_save_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_save_last_month_stats", store=True)
-    total_income_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_income_last_month_stats", store=True)
-    total_expense_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_expense_last_month_stats", store=True)
-    total_transfer_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_transfer_last_month_stats", store=True)
-    total_transfer_external_sent_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_transfer_external_sent_last_month_stats", store=True)
-    total_transfer_external_received_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_transfer_external_received_last_month_stats", store=True)
-    
+    total_save_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    total_income_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    total_expense_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    total_transfer_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    total_transfer_external_sent_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    total_transfer_external_received_last_month = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+
     # Categories (income and expense last month) Will be used only for calculate % variation
-    category_income_last_top1_value = fields.Monetary(currency_field="currency_id", store=True)
-    category_expense_last_top1_value = fields.Monetary(currency_field="currency_id", store=True)
+    category_income_last_top1_value = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
+    category_expense_last_top1_value = fields.Monetary(currency_field="currency_id", compute="_compute_month_stats", store=True)
 
     # DIFFERENCE (IN %) BETWEEN CURRENT AND LAST MONTH VARIABLES
-    difference_expense = fields.Float(compute="_compute_expense_variation")
-    difference_income = fields.Float(compute="_compute_income_variation")
-    difference_save = fields.Float(compute="_compute_save_variation")
-    difference_transfer = fields.Float(compute="_compute_transfer_variation")
-    difference_transfer_ext_sent = fields.Float(compute="_compute_transfer_ext_sent_variation")
-    difference_transfer_ext_received = fields.Float(compute="_compute_transfer_ext_received_variation")
+    difference_expense = fields.Float(compute="_compute_month_stats", store=True)
+    difference_income = fields.Float(compute="_compute_month_stats", store=True)
+    difference_save = fields.Float(compute="_compute_month_stats", store=True)
+    difference_transfer = fields.Float(compute="_compute_month_stats", store=True)
+    difference_transfer_ext_sent = fields.Float(compute="_compute_month_stats", store=True)
+    difference_transfer_ext_received = fields.Float(compute="_compute_month_stats", store=True)
 
     # Small cards TOP1
-    difference_category_income_top1 = fields.Float(compute="_compute_category_income_top1_variation")
-    difference_category_expense_top1 = fields.Float(compute="_compute_category_expense_top1_variation")
-    difference_save_top1 = fields.Float(compute="_compute_save_top1_variation")
-    difference_transfer_top1 = fields.Float(compute="_compute_transfer_top1_variation")
+    difference_category_income_top1 = fields.Float(compute="_compute_month_stats", store=True)
+    difference_category_expense_top1 = fields.Float(compute="_compute_month_stats", store=True)
+    difference_save_top1 = fields.Float(compute="_compute_month_stats", store=True)
+    difference_transfer_top1 = fields.Float(compute="_compute_month_stats", store=True)
+
+    @api.model
+    def _default_currency(self):
+        return self.env["res.currency"]._cashmind_currency_id("EUR")
+
+    @api.model
+    def _create_missing_dashboards(self, user_ids=None):
+        """Creates the dashboard of every active user without one (only of user_ids, if given).
+
+        The users are found with one anti-join and the dashboards are created in batches, so their stored stats
+        are computed once per batch instead of once per dashboard. Returns the new dashboards.
+        """
+        self.flush_model(["user_id"])
+        self.env["res.users"].flush_model(["active"])
+        query = """
+            SELECT u.id FROM res_users u
+            LEFT JOIN cashmind_dashboard d ON d.user_id = u.id
+            WHERE d.id IS NULL AND u.active
+        """
+        params = []
+        if user_ids is not None:
+            query += " AND u.id = ANY(%s)"
+            params.append(list(user_ids))
+        self.env.cr.execute(query + " ORDER BY u.id", params)
+        missing_user_ids = [row[0] for row in self.env.cr.fetchall()]
+
+        dashboards = self.browse()
+        for batch in split_every(PROVISIONING_BATCH_SIZE, missing_user_ids):
+            dashboards |= self.create([{"user_id": user_id} for user_id in batch])
+            dashboards.flush_recordset()
+        return dashboards
 
     # ------------- METHODS FOR RECALCULATING AMOUNTS DEPENDING ON THE CURRENCY_ID (START) -------------
     @api.model
-    def get_used_currencies(self, model):
+    def get_used_currencies(self, model, user_id=None):
         query = f"""
             SELECT DISTINCT currency_id
             FROM {model}
             WHERE currency_id IS NOT NULL
             AND user_id = %s
         """
-        self.env.cr.execute(query, (self.env.uid,))
+        self.env.cr.execute(query, (user_id or self.env.uid,))
         currency_ids = [row[0] for row in self.env.cr.fetchall()]
         return currency_ids if currency_ids else False
-    
-        
+
+    def _read_month_amounts(self, model, date_field, key_field=None, user_field="user_id", currency_field="currency_id"):
+        """Sum 'amount' of model for last and current month of every user in self with ONE grouped query.
+
+        Every movement is converted to the currency of the dashboard with the rates of its own date (joined from
+        res.currency.rate in the same query), so the totals of past months don't change with today's rate.
+        Returns ({user_id: {month_first_day: {key: amount}}}, users with pending movements), where key is the
+        value of key_field (the name, for many2one fields) or None. Movements without a known rate for their date
+        are left out of the sums and counted, so their users are returned as pending.
+        """
+        last_month_range = get_last_month_range()
+        current_month_range = get_current_month_range()
+        Model = self.env[model]
+        Model.flush_model()
+        Currency = self.env["res.currency"]
+
+        key_join = ""
+        key_expr = "NULL"
+        if key_field and Model._fields[key_field].type == "many2one":
+            key_join = f"LEFT JOIN {self.env[Model._fields[key_field].comodel_name]._table} k ON k.id = m.{key_field}"
+            key_expr = "k.name"
+        elif key_field:
+            key_expr = f"m.{key_field}"
+
+        # The dashboard currencies are passed as values: they may not be flushed yet (currency change)
+        query = f"""
+            SELECT user_id, month, key, SUM(converted), COUNT(*) FILTER (WHERE converted IS NULL)
+            FROM (
+                SELECT m.{user_field} AS user_id, date_trunc('month', m.{date_field})::date AS month, {key_expr} AS key,
+                    CASE WHEN m.{currency_field} = d.currency_id THEN m.amount
+                        ELSE m.amount * {Currency._cashmind_rate_sql("d.currency_id", f"m.{date_field}")}
+                            / {Currency._cashmind_rate_sql(f"m.{currency_field}", f"m.{date_field}")} END AS converted
+                FROM {Model._table} m
+                JOIN unnest(%(users)s::int[], %(currencies)s::int[]) AS d(user_id, currency_id) ON d.user_id = m.{user_field}
+                {key_join}
+                WHERE m.active
+                AND m.{date_field} >= %(date_from)s
+                AND m.{date_field} <= %(date_to)s
+            ) AS movements
+            GROUP BY 1, 2, 3
+        """
+        self.env.cr.execute(query, {
+            "users": [rec.user_id.id for rec in self],
+            "currencies": [rec.currency_id.id for rec in self],
+            "date_from": last_month_range[0],
+            "date_to": current_month_range[1],
+            **Currency._cashmind_rate_params(),
+        })
+
+        data = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+        pending = set()
+        for user_id, month, key, amount, unconverted in self.env.cr.fetchall():
+            if amount is not None:
+                data[user_id][month][key] += amount
+            if unconverted:
+                pending.add(user_id)
+        return data, pending
+    # ------------- METHODS FOR RECALCULATING AMOUNTS DEPENDING ON THE CURRENCY_ID (END) -------------
+
+
     # ------------- METHODS FOR RECALCULATING MAIN MONTH STATS AND TOTAL BALANCE (START) -------------
+    @api.depends("rates_date")
+    def _compute_rates_stale(self):
+        for rec in self:
+            rec.rates_stale = self.env["res.currency"]._cashmind_is_rate_stale(rec.rates_date)
+
     @api.depends("total_account", "total_savinggoal", "total_budget")
+    @instrumented
     def _compute_current_total_amount(self):
         for rec in self:
             rec.total_amount = rec.total_account + rec.total_savinggoal + rec.total_budget
 
-    @api.depends("total_amount")
-    def _compute_save_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            current_month_range = get_current_month_range()            
-
-            save = self.env['cashmind.save'].search([
-                ('user_id', '=', user.id),
-                ("date", ">=", current_month_range[0]),
-                ("date", "<=", current_month_range[1])
-                ])
-            
-            # Recalculate save in format name: value for current month
-            data = {}
-            for r in save:
-                save_currency = r.source_currency_id
-                if r.name in data:
-                    if save_currency.id != rec.currency_id.id:
-                        data[r.name] += convert_currencies(from_currency=save_currency.name, to_currency=rec.currency_id.name, amount=r.amount)
-                    else:
-                        data[r.name] += r.amount
-                else:
-                    if save_currency.id != rec.currency_id.id:
-                        data[r.name] = convert_currencies(from_currency=save_currency.name, to_currency=rec.currency_id.name, amount=r.amount)
-                    else:
-                        data[r.name] = r.amount
-            sorted_data = dict(sorted(data.items(), key=lambda x: x[1], reverse=True)) if data else None
-            rec.total_save_name_value = sorted_data
-
-            rec.total_save_month = sum(sorted_data.values()) if sorted_data else 0.00
+    @api.depends("total_amount", "currency_id")
+    @instrumented
+    def _compute_month_stats(self):
+        """Current month, last month, TOP1 and variation stats for every dashboard in self.
 
-    @api.depends("total_amount")
-    def _compute_income_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            current_month_range = get_current_month_range()
-            
-            income = self.env['cashmind.income'].search([
-                ('user_id', '=', user.id),
-                ("date", ">=", current_month_range[0]),
-                ("date", "<=", current_month_range[1])
-                ])
-            
-            # Recalculate cashmind.income stats per category
-            data = {}
-            for r in income:
-                income_currency = r.currency_id
-                if r.category.name != "AJUSTE DE SALDO":
-                    if r.category.name in data:
-                        if income_currency.id != rec.currency_id.id:
-                            data[r.category.name] += convert_currencies(from_currency=income_currency.name, 
-                                                                        to_currency=rec.currency_id.name, amount=r.amount)
-                        else:
-                            data[r.category.name] += r.amount
-                    else:
-                        if income_currency.id != rec.currency_id.id:
-                            data[r.category.name] = convert_currencies(from_currency=income_currency.name, 
-                                                                    to_currency=rec.currency_id.name, amount=r.amount)
-                        else:
-                            data[r.category.name] = r.amount
-            sorted_data = dict(sorted(data.items(), key=lambda x: x[1], reverse=True)) if data else None 
+        Amounts are summed and converted in SQL per user, month and key (one query per model for all the
+        dashboards), at the rate of the date of every movement.
+        """
+        current_month = get_current_month_range()[0]
+        last_month = get_last_month_range()[0]
+
+        income, income_pending = self._read_month_amounts("cashmind.income", "date", key_field="category")
+        expense, expense_pending = self._read_month_amounts("cashmind.expense", "date", key_field="category")
+        save, save_pending = self._read_month_amounts("cashmind.save", "date", key_field="name",
+                                                      currency_field="source_currency_id")
+        transfer, transfer_pending = self._read_month_amounts("cashmind.transfer", "transfer_date", key_field="name",
+                                                              currency_field="source_currency_id")
+        transfer_sent, sent_pending = self._read_month_amounts("cashmind.transfer_external", "transfer_date",
+                                                               currency_field="source_currency_id")
+        transfer_received, received_pending = self._read_month_amounts(
+            "cashmind.transfer_external", "transfer_date", user_field="external_user_id",
+            currency_field="source_currency_id")
+        pending_users = (income_pending | expense_pending | save_pending | transfer_pending | sent_pending
+                         | received_pending)
+
+        newly_pending = False
+        for rec in self:
+            user_id = rec.user_id.id
+            # Movements of the month without a rate for their date are left out until the rates cron loads it
+            newly_pending = newly_pending or (user_id in pending_users and not rec.month_rates_pending)
+            rec.month_rates_pending = user_id in pending_users
+
+            def month_data(data, month):
+                return dict(data[user_id][month])
+
+            # INCOME: per category (AJUSTE DE SALDO doesn't count for the current month stats)
+            income_month = month_data(income, current_month)
+            income_last_month = month_data(income, last_month)
+            income_month.pop("AJUSTE DE SALDO", None)
+            sorted_data = sorted_by_value(income_month)
             rec.total_income_cat_month = sorted_data
-
             rec.total_income_month = sum(sorted_data.values()) if sorted_data else 0.00
-    
-    @api.depends("total_amount")
-    def _compute_expense_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            current_month_range = get_current_month_range()
-            
-            expense = self.env['cashmind.expense'].search([
-                ('user_id', '=', user.id),
-                ("date", ">=", current_month_range[0]),
-                ("date", "<=", current_month_range[1])
-                ])
-            
-            # Recalculate cashmind.expense stats per category
-            data = {}
-            for r in expense:
-                expense_currency = r.currency_id
-                if r.category.name != "AJUSTE DE SALDO":
-                    if r.category.name in data:
-                        if expense_currency.id != rec.currency_id.id:
-                            data[r.category.name] += convert_currencies(from_currency=expense_currency.name, 
-                                                                        to_currency=rec.currency_id.name, amount=r.amount)
-                        else:
-                            data[r.category.name] += r.amount
-                    else:
-                        if expense_currency.id != rec.currency_id.id:
-                            data[r.category.name] = convert_currencies(from_currency=expense_currency.name, 
-                                                                    to_currency=rec.currency_id.name, amount=r.amount)
-                        else:
-                            data[r.category.name] = r.amount
-            sorted_data = dict(sorted(data.items(), key=lambda x: x[1], reverse=True)) if data else None 
+            rec.total_income_last_month = sum(income_last_month.values())
+            rec.category_income_top1 = top1(sorted_data, "category_name", "category_value")
+            rec.category_income_top1_name = rec.category_income_top1["category_name"]
+            rec.category_income_top1_value = rec.category_income_top1["category_value"]
+            rec.category_income_last_top1_value = income_last_month.get(rec.category_income_top1_name, 0.00) if sorted_data else 0.00
+
+            # EXPENSE: per category (AJUSTE DE SALDO doesn't count for the current month stats)
+            expense_month = month_data(expense, current_month)
+            expense_last_month = month_data(expense, last_month)
+            expense_month.pop("AJUSTE DE SALDO", None)
+            sorted_data = sorted_by_value(expense_month)
             rec.total_expense_cat_month = sorted_data
-
             rec.total_expense_month = sum(sorted_data.values()) if sorted_data else 0.00
-    
-    @api.depends("total_amount")
-    def _compute_transfer_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            current_month_range = get_current_month_range()            
-
-            transfer = self.env['cashmind.transfer'].search([
-                ('user_id', '=', user.id),
-                ("transfer_date", ">=", current_month_range[0]),
-                ("transfer_date", "<=", current_month_range[1])
-                ])
-            
-            # Recalculate transfer in format name: value for current month
-            data = {}
-            for r in transfer:
-                transfer_currency = r.source_currency_id
-                if r.name in data:
-                    if transfer_currency.id != rec.currency_id.id:
-                        data[r.name] += convert_currencies(from_currency=transfer_currency.name, to_currency=rec.currency_id.name, 
-                                                           amount=r.amount)
-                    else:
-                        data[r.name] += r.amount
-                else:
-                    if transfer_currency.id != rec.currency_id.id:
-                        data[r.name] = convert_currencies(from_currency=transfer_currency.name, to_currency=rec.currency_id.name, 
-                                                          amount=r.amount)
-                    else:
-                        data[r.name] = r.amount
-            sorted_data = dict(sorted(data.items(), key=lambda x: x[1], reverse=True)) if data else None
-            rec.total_transfer_name_value = sorted_data
+            rec.total_expense_last_month = sum(expense_last_month.values())
+            rec.category_expense_top1 = top1(sorted_data, "category_name", "category_value")
+            rec.category_expense_top1_name = rec.category_expense_top1["category_name"]
+            rec.category_expense_top1_value = rec.category_expense_top1["category_value"]
+            rec.category_expense_last_top1_value = expense_last_month.get(rec.category_expense_top1_name, 0.00) if sorted_data else 0.00
+
+            # SAVE: per save name
+            sorted_data = sorted_by_value(month_data(save, current_month))
+            rec.total_save_name_value = sorted_data
+            rec.total_save_month = sum(sorted_data.values()) if sorted_data else 0.00
+            rec.total_save_last_month = sum(month_data(save, last_month).values())
+            rec.save_top1 = top1(sorted_data, "save_name", "save_value")
+            rec.save_top1_name = rec.save_top1["save_name"]
+            rec.save_top1_value = rec.save_top1["save_value"]
 
+            # TRANSFER: per transfer name
+            sorted_data = sorted_by_value(month_data(transfer, current_month))
+            rec.total_transfer_name_value = sorted_data
             rec.total_transfer_month = sum(sorted_data.values()) if sorted_data else 0.00
-    
-    @api.depends("total_amount")
-    def _compute_transfer_external_sent_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            current_month_range = get_current_month_range()
-
-            transfer = self.env['cashmind.transfer_external'].search([
-                ('user_id', '=', user.id),
-                ("transfer_date", ">=", current_month_range[0]),
-                ("transfer_date", "<=", current_month_range[1])
-                ])
-            
-            # Recalculate cashmind.transfer_external sent stats
-            pre_total_month_converted = 0.00
-            pre_total_month = 0.00
-            for r in transfer:
-                if r.source_currency_id.id == rec.currency_id.id:
-                    pre_total_month += r.amount
-                else:
-                    pre_total_month_converted += convert_currencies(from_currency=r.source_currency_id.name, 
-                                                                         to_currency=rec.currency_id.name, amount=r.amount)
-            
-            rec.total_transfer_external_sent_month = pre_total_month + pre_total_month_converted
-
-
-    @api.depends("total_amount")
-    def _compute_transfer_external_received_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            current_month_range = get_current_month_range()
-
-            transfer = self.env['cashmind.transfer_external'].search([
-                ('external_user_id', '=', user.id),
-                ("transfer_date", ">=", current_month_range[0]),
-                ("transfer_date", "<=", current_month_range[1])
-                ])
-            
-           # Recalculate cashmind.transfer_external received stats
-            pre_total_month_converted = 0.00
-            pre_total_month = 0.00
-            for r in transfer:
-                if r.source_currency_id.id == rec.currency_id.id:
-                    pre_total_month += r.amount
-                else:
-                    pre_total_month_converted += convert_currencies(from_currency=r.source_currency_id.name, 
-                                                                         to_currency=rec.currency_id.name, amount=r.amount)
-            
-            rec.total_transfer_external_received_month = pre_total_month + pre_total_month_converted
+            rec.total_transfer_last_month = sum(month_data(transfer, last_month).values())
+            rec.transfer_top1 = top1(sorted_data, "transfer_name", "transfer_value")
+            rec.transfer_top1_name = rec.transfer_top1["transfer_name"]
+            rec.transfer_top1_value = rec.transfer_top1["transfer_value"]
+
+            # TRANSFER EXTERNAL: sent and received
+            rec.total_transfer_external_sent_month = sum(month_data(transfer_sent, current_month).values())
+            rec.total_transfer_external_sent_last_month = sum(month_data(transfer_sent, last_month).values())
+            rec.total_transfer_external_received_month = sum(month_data(transfer_received, current_month).values())
+            rec.total_transfer_external_received_last_month = sum(month_data(transfer_received, last_month).values())
+
+            # DIFFERENCE (IN %) BETWEEN CURRENT AND LAST MONTH
+            rec.difference_expense = variation(rec.total_expense_month, rec.total_expense_last_month)
+            rec.difference_income = variation(rec.total_income_month, rec.total_income_last_month)
+            rec.difference_save = variation(rec.total_save_month, rec.total_save_last_month)
+            rec.difference_transfer = variation(rec.total_transfer_month, rec.total_transfer_last_month)
+            rec.difference_transfer_ext_sent = variation(rec.total_transfer_external_sent_month,
+                                                         rec.total_transfer_external_sent_last_month)
+            rec.difference_transfer_ext_received = variation(rec.total_transfer_external_received_month,
+                                                             rec.total_transfer_external_received_last_month)
+            rec.difference_category_income_top1 = variation(rec.category_income_top1_value,
+                                                            rec.category_income_last_top1_value)
+            rec.difference_category_expense_top1 = variation(rec.category_expense_top1_value,
+                                                             rec.category_expense_last_top1_value)
+            # Small cards TOP1 for save and transfer show the share of the TOP1 in the month total
+            rec.difference_save_top1 = rec.save_top1_value / rec.total_save_month * 100 if (
+                rec.save_top1_value and rec.total_save_month) else float(0.00)
+            rec.difference_transfer_top1 = rec.transfer_top1_value / rec.total_transfer_month * 100 if (
+                rec.transfer_top1_value and rec.total_transfer_month) else float(0.00)
+
+        cron = self.env.ref("cashmind.ir_cron_cashmind_currency_rates", raise_if_not_found=False)
+        if newly_pending and cron:
+            # Download the missing rates as soon as possible, outside of this transaction
+            cron.sudo()._trigger()
     # ------------- METHODS FOR RECALCULATING MAIN MONTH STATS AND TOTAL BALANCE (END) -------------
 
-    # ------------- METHODS FOR RECALCULATING MAIN LAST MONTH STATS (START) -------------
-    @api.depends("total_amount")
-    def _compute_save_last_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            last_month_range = get_last_month_range()
-
-            save_last = self.env['cashmind.save'].search([
-                ('user_id', '=', user.id),
-                ("date", ">=", last_month_range[0]),
-                ("date", "<=", last_month_range[1])
-                ])
-            
-            pre_total_last_month_converted = 0.00
-            pre_total_last_month = 0.00
-            for r in save_last:
-                if r.source_currency_id.id == rec.currency_id.id:
-                    pre_total_last_month += r.amount
-                else:
-                    pre_total_last_month_converted += convert_currencies(from_currency=r.source_currency_id.name, 
-                                                                         to_currency=rec.currency_id.name, amount=r.amount)
-            
-            rec.total_save_last_month = pre_total_last_month + pre_total_last_month_converted
-
-    @api.depends("total_amount")
-    def _compute_income_last_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            last_month_range = get_last_month_range()
-
-            income_last = self.env['cashmind.income'].search([
-                ('user_id', '=', user.id),
-                ("date", ">=", last_month_range[0]),
-                ("date", "<=", last_month_range[1])
-                ])
-            
-            pre_total_last_month_converted = 0.00
-            pre_total_last_month = 0.00
-            for r in income_last:
-                if r.currency_id.id == rec.currency_id.id:
-                    pre_total_last_month += r.amount
-                else:
-                    pre_total_last_month_converted += convert_currencies(from_currency=r.currency_id.name, 
-                                                                         to_currency=rec.currency_id.name, amount=r.amount)
-            
-            rec.total_income_last_month = pre_total_last_month + pre_total_last_month_converted
-
-            # Recalculate last month category income value for the last top1 income category
-            pre_total = float(0.00)
-            if rec.total_income_cat_month:
-                for cat_name, _ in rec.total_income_cat_month.items():
-                    # Filtering by cat_name and last month
-                    income_cat_top1_last = self.env['cashmind.income'].search([
-                        ('user_id', '=', user.id),
-                        ("date", ">=", last_month_range[0]),
-                        ("date", "<=", last_month_range[1]),
-                        ("category", "=", cat_name)
-                        ])
-
-                    if income_cat_top1_last:
-                        for r in income_cat_top1_last:
-                            if r.currency_id.id != rec.currency_id.id:
-                                pre_total += convert_currencies(from_currency=r.currency_id.name, to_currency=rec.currency_id.name, 
-                                                                amount=r.amount)
-                            else:
-                                pre_total += r.amount
-                    # Break because we only want the first category in the ordered dict (reverse=True)
-                    break
-                rec.category_income_last_top1_value = pre_total
-    
-    @api.depends("total_amount")
-    def _compute_expense_last_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            last_month_range = get_last_month_range()
-
-            expense_last = self.env['cashmind.expense'].search([
-                ('user_id', '=', user.id),
-                ("date", ">=", last_month_range[0]),
-                ("date", "<=", last_month_range[1])
-                ])
-            
-            pre_total_last_month_converted = 0.00
-            pre_total_last_month = 0.00
-            for r in expense_last:
-                if r.currency_id.id == rec.currency_id.id:
-                    pre_total_last_month += r.amount
-                else:
-                    pre_total_last_month_converted += convert_currencies(from_currency=r.currency_id.name, 
-                                                                         to_currency=rec.currency_id.name, amount=r.amount)
-            
-            rec.total_expense_last_month = pre_total_last_month + pre_total_last_month_converted
-
-            # Recalculate last month category expense value for the last top1 expense category
-            pre_total = float(0.00)
-            if rec.total_expense_cat_month:
-                for cat_name, _ in rec.total_expense_cat_month.items():
-                    # Filtering by cat_name and last month
-                    expense_cat_top1_last = self.env['cashmind.expense'].search([
-                        ('user_id', '=', user.id),
-                        ("date", ">=", last_month_range[0]),
-                        ("date", "<=", last_month_range[1]),
-                        ("category", "=", cat_name)
-                        ])
-
-                    if expense_cat_top1_last:
-                        for r in expense_cat_top1_last:
-                            if r.currency_id.id != rec.currency_id.id:
-                                pre_total += convert_currencies(from_currency=r.currency_id.name, to_currency=rec.currency_id.name, 
-                                                                amount=r.amount)
-                            else:
-                                pre_total += r.amount
-                    # Break because we only want the first category in the ordered dict (reverse=True)
-                    break
-                rec.category_expense_last_top1_value = pre_total
-            
-    
-    @api.depends("total_amount")
-    def _compute_transfer_last_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            last_month_range = get_last_month_range()
-
-            transfer_last = self.env['cashmind.transfer'].search([
-                ('user_id', '=', user.id),
-                ("transfer_date", ">=", last_month_range[0]),
-                ("transfer_date", "<=", last_month_range[1])
-                ])
-            
-            pre_total_last_month_converted = 0.00
-            pre_total_last_month = 0.00
-            for r in transfer_last:
-                if r.source_currency_id.id == rec.currency_id.id:
-                    pre_total_last_month += r.amount
-                else:
-                    pre_total_last_month_converted += convert_currencies(from_currency=r.source_currency_id.name, 
-                                                                         to_currency=rec.currency_id.name, amount=r.amount)
-            
-            rec.total_transfer_last_month = pre_total_last_month + pre_total_last_month_converted
-
-    @api.depends("total_amount")
-    def _compute_transfer_external_sent_last_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            last_month_range = get_last_month_range()
-
-            transfer_last = self.env['cashmind.transfer_external'].search([
-                ('user_id', '=', user.id),
-                ("transfer_date", ">=", last_month_range[0]),
-                ("transfer_date", "<=", last_month_range[1])
-                ])
-            
-            # Recalculate cashmind.transfer_external sent stats
-            pre_total_month_converted = 0.00
-            pre_total_month = 0.00
-            for r in transfer_last:
-                if r.source_currency_id.id == rec.currency_id.id:
-                    pre_total_month += r.amount
-                else:
-                    pre_total_month_converted += convert_currencies(from_currency=r.source_currency_id.name, 
-                                                                         to_currency=rec.currency_id.name, amount=r.amount)
-            
-            rec.total_transfer_external_sent_last_month = pre_total_month + pre_total_month_converted
-    
-    @api.depends("total_amount")
-    def _compute_transfer_external_received_last_month_stats(self):
-        for rec in self:
-            user = rec.user_id
-            last_month_range = get_last_month_range()
-
-            transfer_last = self.env['cashmind.transfer_external'].search([
-                ('external_user_id', '=', user.id),
-                ("transfer_date", ">=", last_month_range[0]),
-                ("transfer_date", "<=", last_month_range[1])
-                ])
-            
-            # Recalculate cashmind.transfer_external received stats
-            pre_total_month_converted = 0.00
-            pre_total_month = 0.00
-            for r in transfer_last:
-                if r.source_currency_id.id == rec.currency_id.id:
-                    pre_total_month += r.amount
-                else:
-                    pre_total_month_converted += convert_currencies(from_currency=r.source_currency_id.name, 
-                                                                         to_currency=rec.currency_id.name, amount=r.amount)
-            
-            rec.total_transfer_external_received_last_month = pre_total_month + pre_total_month_converted
-    # ------------- METHODS FOR RECALCULATING MAIN LAST MONTH STATS (END) -------------
-
-
-
-
-    # ------------- METHODS FOR RECALCULATING VARIATIONS (START) -------------
-    @api.depends("total_expense_month", "total_expense_last_month")
-    def _compute_expense_variation(self):
-        for rec in self:
-            difference = rec.total_expense_month - rec.total_expense_last_month
-            if not difference:
-                rec.difference_expense = float(0.00)
-            else:
-                if rec.total_expense_last_month == 0:
-                    rec.difference_expense = float(100.00)
-                else:
-                    if difference > 0:
-                        rec.difference_expense = float(rec.total_expense_month / rec.total_expense_last_month * 100)
-                    elif difference < 0:
-                        rec.difference_expense = float(rec.total_expense_month / rec.total_expense_last_month * 100 - 100)
-    
-    @api.depends("total_income_month", "total_income_last_month")
-    def _compute_income_variation(self):
-        for rec in self:
-            difference = rec.total_income_month - rec.total_income_last_month
-            if not difference:
-                rec.difference_income = float(0.00)
-            else:
-                if rec.total_income_last_month == 0:
-                    rec.difference_income = float(100.00)
-                else:
-                    if difference > 0:
-                        rec.difference_income = float(rec.total_income_month / rec.total_income_last_month * 100)
-                    elif difference < 0:
-                        rec.difference_income = float(rec.total_income_month / rec.total_income_last_month * 100 - 100)
-    
-    @api.depends("total_save_month", "total_save_last_month")
-    def _compute_save_variation(self):
-        for rec in self:
-            difference = rec.total_save_month - rec.total_save_last_month
-            if not difference:
-                rec.difference_save = float(0.00)
-            else:
-                if rec.total_save_last_month == 0:
-                    rec.difference_save = float(100.00)
-                else:
-                    if difference > 0:
-                        rec.difference_save = float(rec.total_save_month / rec.total_save_last_month * 100)
-                    elif difference < 0:
-                        rec.difference_save = float(rec.total_save_month / rec.total_save_last_month * 100 - 100)
-
-    @api.depends("total_transfer_month", "total_transfer_last_month")
-    def _compute_transfer_variation(self):
-        for rec in self:
-            difference = rec.total_transfer_month - rec.total_transfer_last_month
-            if not difference:
-                rec.difference_transfer = float(0.00)
-            else:
-                if rec.total_transfer_last_month == 0:
-                    rec.difference_transfer = float(100.00)
-                else:
-                    if difference > 0:
-                        rec.difference_transfer = float(rec.total_transfer_month / rec.total_transfer_last_month * 100)
-                    elif difference < 0:
-                        rec.difference_transfer = float(rec.total_transfer_month / rec.total_transfer_last_month * 100 - 100)
-
-    @api.depends("total_amount")
-    def _compute_transfer_ext_sent_variation(self):
-        for rec in self:
-            difference = rec.total_transfer_external_sent_month - rec.total_transfer_external_sent_last_month
-            if not difference:
-                rec.difference_transfer_ext_sent = float(0.00)
-            else:
-                if rec.total_transfer_external_sent_last_month == 0:
-                    rec.difference_transfer_ext_sent = float(100.00)
-                else:
-                    if difference > 0:
-                        rec.difference_transfer_ext_sent = float(
-                            rec.total_transfer_external_sent_month / rec.total_transfer_external_sent_last_month * 100
-                            )
-                    elif difference < 0:
-                        rec.difference_transfer_ext_sent = float(
-                            rec.total_transfer_external_sent_month / rec.total_transfer_external_sent_last_month * 100 - 100
-                            )
-
-    @api.depends("total_amount")
-    def _compute_transfer_ext_received_variation(self):
-        for rec in self:
-            difference = rec.total_transfer_external_received_month - rec.total_transfer_external_received_last_month
-            if not difference:
-                rec.difference_transfer_ext_received = float(0.00)
-            else:
-                if rec.total_transfer_external_received_last_month == 0:
-                    rec.difference_transfer_ext_received = float(100.00)
-                else:
-                    if difference > 0:
-                        rec.difference_transfer_ext_received = float(
-                            rec.total_transfer_external_received_month / rec.total_transfer_external_received_last_month * 100
-                            )
-                    elif difference < 0:
-                        rec.difference_transfer_ext_received = float(
-                            rec.total_transfer_external_received_month / rec.total_transfer_external_received_last_month * 100 - 100
-                            )
-
-    @api.depends("category_income_top1_value", "category_income_last_top1_value")
-    def _compute_category_income_top1_variation(self):
-        for rec in self:
-            difference = rec.category_income_top1_value - rec.category_income_last_top1_value
-            if not difference:
-                rec.difference_category_income_top1 = float(0.00)
-            else:
-                if rec.category_income_last_top1_value == 0:
-                    rec.difference_category_income_top1 = float(100.00)
-                else:
-                    if difference > 0:
-                        rec.difference_category_income_top1 = float(rec.category_income_top1_value / rec.category_income_last_top1_value * 100)
-                    elif difference < 0:
-                        rec.difference_category_income_top1 = float(rec.category_income_top1_value / rec.category_income_last_top1_value * 100 - 100)
-
-    @api.depends("category_expense_top1_value", "category_expense_last_top1_value")
-    def _compute_category_expense_top1_variation(self):
-        for rec in self:
-            difference = rec.category_expense_top1_value - rec.category_expense_last_top1_value
-            if not difference:
-                rec.difference_category_expense_top1 = float(0.00)
-            else:
-                if rec.category_expense_last_top1_value == 0:
-                    rec.difference_category_expense_top1 = float(100.00)
-                else:
-                    if difference > 0:
-                        rec.difference_category_expense_top1 = float(rec.category_expense_top1_value / rec.category_expense_last_top1_value * 100)
-                    elif difference < 0:
-                        rec.difference_category_expense_top1 = float(rec.category_expense_top1_value / rec.category_expense_last_top1_value * 100 - 100)
-
-    @api.depends("save_top1_value", "total_save_month")
-    def _compute_save_top1_variation(self):
-        for rec in self:
-            rec.difference_save_top1 = rec.save_top1_value / rec.total_save_month * 100 if (rec.save_top1_value and rec.total_save_month) else float(0.00)
-    
-    @api.depends("transfer_top1_value", "total_transfer_month")
-    def _compute_transfer_top1_variation(self):
-        for rec in self:
-            rec.difference_transfer_top1 = rec.transfer_top1_value / rec.total_transfer_month * 100 if (rec.transfer_top1_value and rec.total_transfer_month) else float(0.00)
-    # ------------- METHOD FOR RECALCULATING VARIATIONS (END) -------------
-    
-
-    # ------------- METHODS FOR CALCULATING TOP1 OF SOME MODELS / CURRENT MONTH (START) -------------
-    @api.depends("total_income_cat_month")
-    def _compute_top1_income_cat(self):
-        for rec in self:
-            if rec.total_income_cat_month:
-                top1 = {}
-                for key, value in rec.total_income_cat_month.items():
-                    top1 = {"category_name": key, "category_value": float(value)}
-                    break # We only need the first one for the TOP1
-                rec.category_income_top1 = top1
-            else:
-                rec.category_income_top1 = {"category_name": "(sin datos)", "category_value": float(0.00)}
-          
-    @api.depends("total_expense_cat_month")
-    def _compute_top1_expense_cat(self):
-        for rec in self:
-            if rec.total_expense_cat_month:
-                top1 = {}
-                for key, value in rec.total_expense_cat_month.items():
-                    top1 = {"category_name": key, "category_value": float(value)}
-                    break # We only need the first one for the TOP1
-                rec.category_expense_top1 = top1
-            else:
-                rec.category_expense_top1 = {"category_name": "(sin datos)", "category_value": float(0.00)}
-
-    @api.depends("total_save_name_value")
-    def _compute_top1_save(self):
-        for rec in self:
-            if rec.total_save_name_value:
-                top1 = {}
-                for key, value in rec.total_save_name_value.items():
-                    top1 = {"save_name": key, "save_value": float(value)}
-                    break # We only need the first one for the TOP1
-                rec.save_top1 = top1
-            else:
-                rec.save_top1 = {"save_name": "(sin datos)", "save_value": float(0.00)}
-
-    @api.depends("total_transfer_name_value")
-    def _compute_top1_transfer(self):
-        for rec in self:
-            if rec.total_transfer_name_value:
-                top1 = {}
-                for key, value in rec.total_transfer_name_value.items():
-                    top1 = {"transfer_name": key, "transfer_value": float(value)}
-                    break # We only need the first one for the TOP1
-                rec.transfer_top1 = top1
-            else:
-                rec.transfer_top1 = {"transfer_name": "(sin datos)", "transfer_value": float(0.00)}
-    # ------------- METHODS FOR CATEGORY STATS / CURRENT MONTH (END) -------------
-
-    # ------------- METHODS FOR DIVIDING JSON VARIABLES INTO 2 VARIABLES (NAME AND VALUE) (START) -------------
-    # It is better dividing the JSON variables (top1) into 2 different variables (name, value)
-    # This way, the value (now a monetary field) is correctly displayed in the kanban view (dashboard)
-    @api.depends("category_income_top1")
-    def _compute_top1_income_cat_name_value(self):
-        for rec in self:
-            if rec.category_income_top1:
-                rec.category_income_top1_name = rec.category_income_top1["category_name"]
-                rec.category_income_top1_value = float(rec.category_income_top1["category_value"])
-    
-    @api.depends("category_expense_top1")
-    def _compute_top1_expense_cat_name_value(self):
-        for rec in self:
-            if rec.category_expense_top1:
-                rec.category_expense_top1_name = rec.category_expense_top1["category_name"]
-                rec.category_expense_top1_value = float(rec.category_expense_top1["category_value"])
-    
-    @api.depends("save_top1")
-    def _compute_top1_save_name_value(self):
-        for rec in self:
-            if rec.save_top1:
-                rec.save_top1_name = rec.save_top1["save_name"]
-                rec.save_top1_value = float(rec.save_top1["save_value"])
-
-    @api.depends("transfer_top1")
-    def _compute_top1_transfer_name_value(self):
-        for rec in self:
-            if rec.transfer_top1:
-                rec.transfer_top1_name = rec.transfer_top1["transfer_name"]
-                rec.transfer_top1_value = float(rec.transfer_top1["transfer_value"])
-    # ------------- METHODS FOR DIVIDING JSON VARIABLES INTO 2 VARIABLES (NAME AND VALUE) (END) -------------
-    
 
     # ------------- METHOD FOR RECALCULATING DASHBOARD STATS -------------
     # Recalculating will be manually called from other models (create(), write(), unlink()) OR when changing currency_id
+    # Conversions only read the stored rates (cached in memory): a save never waits for (or fails because of) the
+    # exchange rate API
+    @instrumented
     def recalculate_dashboard(self, external_user_id = None):
+        newly_pending = False
         for dashboard in self:
             user = dashboard.user_id if not external_user_id else external_user_id
-            current_currency_name = self.env["res.currency"].search([("id", "=", dashboard.currency_id.id)])[0].name
+            current_currency_name = self.env["res.currency"]._cashmind_currency_code(dashboard.currency_id.id)
+            conversion = {"pending": False, "dates": []}
 
             def recalculate_for_model(model_underscore, model_dot):
                 # Recalculating for TOTAL_BUDGET
                 current_currency = {}
                 other_currencies = {}
-                used_currencies = dashboard.get_used_currencies(model=model_underscore)
+                used_currencies = dashboard.get_used_currencies(model=model_underscore, user_id=user.id)
                 if used_currencies:
                     for currency_id in used_currencies:                    
                         mod = self.env[model_dot].search([("user_id", "=", user.id), ("currency_id", "=", currency_id)])
                         total = sum(mod.mapped("balance")) if mod else 0.00
                         if currency_id != dashboard.currency_id.id:
-                            currency_name = self.env["res.currency"].search([("id", "=", currency_id)])[0].name
-                            other_currencies[currency_name] = total
+                            other_currencies[currency_id] = total
                         else:
                             current_currency[current_currency_name] = total
                 
                 # Amount already in the current currency_id
                 pre_total = current_currency[current_currency_name] if current_currency else 0.00
 
-                # Let's convert to the current currency
+                # Let's convert to the current currency, all the currencies at once with the cached rates
                 pre_total_converted = 0.00
                 if other_currencies:                
-                    for currency, amount in other_currencies.items():
-                        total = convert_currencies(from_currency=currency, to_currency=current_currency_name, 
-                                                            amount=amount)
-                        pre_total_converted += total
+                    converted, rate_date = self.env["res.currency"]._cashmind_convert_amounts(
+                        list(other_currencies.values()), list(other_currencies), dashboard.currency_id.id)
+                    if np.isnan(converted).any():
+                        # No rate known yet: left out until the rates cron downloads it
+                        conversion["pending"] = True
+                    if rate_date:
+                        conversion["dates"].append(rate_date)
+                    pre_total_converted = float(np.nansum(converted))
                 
                 return pre_total + pre_total_converted
 
             dashboard.total_budget = recalculate_for_model(model_underscore="cashmind_budget", model_dot="cashmind.budget")
             dashboard.total_account = recalculate_for_model(model_underscore="cashmind_account", model_dot="cashmind.account")
             dashboard.total_savinggoal = recalculate_for_model(model_underscore="cashmind_savinggoal", model_dot="cashmind.savinggoal")
+            newly_pending = newly_pending or (conversion["pending"] and not dashboard.rates_pending)
+            dashboard.rates_pending = conversion["pending"]
+            dashboard.rates_date = min(conversion["dates"]) if conversion["dates"] else False
+
+        cron = self.env.ref("cashmind.ir_cron_cashmind_currency_rates", raise_if_not_found=False)
+        if newly_pending and cron:
+            # Download the missing rates as soon as possible, outside of this transaction
+            cron.sudo()._trigger()
+
+    @api.model
+    def _cron_convert_pending(self):
+        """Downloads the rates missing for the pending dashboards (one request) and recalculates them."""
+        dashboards = self.sudo().search(["|", ("rates_pending", "=", True), ("month_rates_pending", "=", True)])
+        if not dashboards:
+            return True
+        self.env.cr.execute("""
+            SELECT currency_id FROM cashmind_account WHERE user_id = ANY(%(users)s)
+            UNION SELECT currency_id FROM cashmind_budget WHERE user_id = ANY(%(users)s)
+            UNION SELECT currency_id FROM cashmind_savinggoal WHERE user_id = ANY(%(users)s)
+            UNION SELECT currency_id FROM cashmind_dashboard WHERE id = ANY(%(dashboards)s)
+        """, {"users": dashboards.user_id.ids, "dashboards": dashboards.ids})
+        Currency = self.env["res.currency"]
+        codes = [Currency._cashmind_currency_code(row[0]) for row in self.env.cr.fetchall() if row[0]]
+        try:
+            Currency._cashmind_fetch_rates(codes)
+            if any(dashboards.mapped("month_rates_pending")):
+                # Movements of the last two months are converted at the rate of their own date
+                Currency._cashmind_load_rate_history(codes, get_last_month_range()[0])
+        except UserError as e:
+            # Still offline: the dashboards stay pending until the next run
+            _logger.warning("Exchange rates could not be downloaded: %s", e)
+            return True
+        dashboards.recalculate_dashboard()
+        # The month stats too: their movements are converted at the rate of their own date
+        self.env.add_to_compute(self._fields["total_income_month"], dashboards)
+        return True
+
+    # ------------- METHODS FOR LAZY LOADING OF THE DASHBOARD CARDS (START) -------------
+    @api.model
+    def get_dashboard_cards(self, cards=None, breakdown=False):
+        """RPC for the dashboard client: returns only the requested cards of the current user's dashboard.
 
+        Monetary values are returned already formatted, percentages as floats. With breakdown=True, the JSON
+        {name: value} map of every card is added as a list of [name, formatted value]. "version" changes every
+        time the stats are recalculated, so the client can keep its cache until then.
+        """
+        cards = cards or ["summary"]
+        dashboard = self.search([("user_id", "=", self.env.uid)], limit=1)
+        if not dashboard:
+            return {}
+
+        field_names = [name for card in cards for name in DASHBOARD_CARDS.get(card, [])]
+        if breakdown:
+            field_names += [DASHBOARD_BREAKDOWNS[card] for card in cards if card in DASHBOARD_BREAKDOWNS]
+        values = dashboard.read(field_names)[0]
+
+        currency = dashboard.currency_id
+        data = {
+            "version": str(dashboard.write_date),
+            "currency": currency.name,
+            # Cards with amounts in other currencies are partial (pending) or use an old rate (stale)
+            "rates_pending": dashboard.rates_pending or dashboard.month_rates_pending,
+            "rates_stale": dashboard.rates_stale,
+            "rates_date": fields.Date.to_string(dashboard.rates_date) if dashboard.rates_date else False,
+        }
+        for card in cards:
+            card_data = {}
+            for name in DASHBOARD_CARDS.get(card, []):
+                if self._fields[name].type == "monetary":
+                    card_data[name] = format_amount(self.env, values[name], currency)
+                else:
+                    card_data[name] = values[name]
+            if breakdown and card in DASHBOARD_BREAKDOWNS:
+                card_data["breakdown"] = [
+                    [name, format_amount(self.env, value, currency)]
+                    for name, value in (values[DASHBOARD_BREAKDOWNS[card]] or {}).items()
+                ]
+            data[card] = card_data
+        return data
+    # ------------- METHODS FOR LAZY LOADING OF THE DASHBOARD CARDS (END) -------------
+
+    @profiled
+    @instrumented
     def write(self, vals):
         for rec in self:
             if "currency_id" in vals and vals["currency_id"] != rec.currency_id.id:
@@ -1,12 +1,22 @@
 from odoo import fields, models, api
 from odoo.exceptions import ValidationError
 from datetime import datetime
-from ..utils import notification, update_balance, clean_input
+from collections import defaultdict
+from ..utils import notification, update_balance, clean_input, get_month_label, get_quarter_label, robust_z_scores, \
+    set_movement_fingerprint
+from ..instrumentation import instrumented, profiled
+from dateutil.relativedelta import relativedelta
+import numpy as np
+
+# Anomaly detection: modified z-score above which an expense is flagged, and history used to score it
+ANOMALY_THRESHOLD = 3.5
+ANOMALY_HISTORY_MONTHS = 12
+ANOMALY_MIN_HISTORY = 5
 
 class Expense(models.Model):
     _name = "cashmind.expense"
     
-    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", unique=True,
+    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", unique=True, index=True,
                               default=lambda self: self.env.user)
     name = fields.Char(string="Nombre", required=True)    
     budget = fields.Many2one("cashmind.budget", string="Presupuesto", ondelete="restrict", domain="[('user_id', '=', uid)]")
@@ -20,16 +30,28 @@ class Expense(models.Model):
     currency_id = fields.Many2one("res.currency", string="Moneda", readonly=True, 
                                 store=True, compute="_compute_source_currency", default=lambda self: self._default_currency())
     amount = fields.Monetary(string="Cantidad", currency_field="currency_id", required=True)
-    date = fields.Date(string="Fecha", default=datetime.today(), required=True)
+    date = fields.Date(string="Fecha", default=datetime.today(), required=True, index=True)
     invoice = fields.Binary(string="Factura")
     has_invoice = fields.Boolean(string="Con factura", compute="_compute_has_invoice", store=True)
+    month = fields.Char(string="Mes", compute="_compute_period", store=True, index=True)
+    quarter = fields.Char(string="Trimestre", compute="_compute_period", store=True)
+    fingerprint = fields.Char(string="Huella de importación", readonly=True, copy=False)
+    possible_duplicate = fields.Boolean(string="Posible duplicado", readonly=True, copy=False)
+    anomaly_checked = fields.Boolean(string="Revisado por anomalías", readonly=True, copy=False, index=True)
+    anomaly_score = fields.Float(string="Puntuación de anomalía", readonly=True, copy=False, digits=(16, 2))
+    is_anomaly = fields.Boolean(string="Gasto inusual", readonly=True, copy=False)
+
     note = fields.Text(string="Nota")
     active = fields.Boolean(string="Mostrar", default=True)
+
+    _sql_constraints = [
+        ("fingerprint_user_unique", "unique(user_id, fingerprint)",
+         "Este movimiento ya fue importado anteriormente desde un extracto bancario."),
+    ]
         
     @api.model
     def _default_currency(self):
-        currency = self.env["res.currency"].search([("name", "=", "EUR")], limit=1)
-        return currency.id if currency else False
+        return self.env["res.currency"]._cashmind_currency_id("EUR")
 
     @api.onchange("account")
     def _compute_availability(self):
@@ -65,7 +87,15 @@ class Expense(models.Model):
     def _compute_has_invoice(self):
         for rec in self:
             rec.has_invoice = bool(rec.invoice)
+
+    @api.depends("date")
+    def _compute_period(self):
+        for rec in self:
+            rec.month = get_month_label(rec.date) if rec.date else False
+            rec.quarter = get_quarter_label(rec.date) if rec.date else False
     
+    @profiled
+    @instrumented
     def create(self, vals):
         if isinstance(vals, list):
             vals = vals[0]
@@ -113,6 +143,14 @@ class Expense(models.Model):
         if note:
             vals["note"] = note
 
+        # Category missing: use the categorization rules of the user
+        if not vals.get("category") and name:
+            vals["category"] = self.env["cashmind.category_rule"].match_category(
+                name, vals.get("amount"), vals.get("account"), "expense")
+
+        # Same duplicate detection as the statement importer
+        set_movement_fingerprint(self, vals, sign=-1)
+
         expense = super().create(vals)
 
         # Update balance
@@ -127,13 +165,87 @@ class Expense(models.Model):
                     "Se actualizó correctamente el saldo de la cuenta asociada a este gasto.",
                     "success") 
             
-        # Recalculate dashboard stats
-        user_id = expense.user_id.id
-        dashboards = self.env['cashmind.dashboard'].search([('user_id', '=', user_id)])
-        dashboards.recalculate_dashboard()
+        # Recalculate dashboard stats (unless the caller does it once for many records)
+        if not self.env.context.get("defer_dashboard"):
+            user_id = expense.user_id.id
+            dashboards = self.env['cashmind.dashboard'].search([('user_id', '=', user_id)])
+            dashboards.recalculate_dashboard()
         
         return expense 
+
+    @api.model
+    def _get_existing_fingerprints(self, fingerprints):
+        """Fingerprints (of the list given) already imported by the current user, with a single query."""
+        self.env.cr.execute(f"""
+            SELECT fingerprint FROM {self._table}
+            WHERE user_id = %s AND fingerprint = ANY(%s)
+        """, (self.env.uid, list(fingerprints)))
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _cron_detect_anomalies(self, user_chunk_size=200, auto_commit=True):
+        """Scores the expenses not yet checked against the history of the same user, category and currency."""
+        self.env.cr.execute(f"""
+            SELECT DISTINCT user_id FROM {self._table} WHERE NOT COALESCE(anomaly_checked, false)
+        """)
+        user_ids = [row[0] for row in self.env.cr.fetchall()]
+        for start in range(0, len(user_ids), user_chunk_size):
+            self._detect_anomalies(user_ids[start:start + user_chunk_size])
+            if auto_commit:
+                self.env.cr.commit()
+        return True
+
+    @api.model
+    def _detect_anomalies(self, user_ids):
+        """Loads the history of a chunk of users as columnar arrays (one query), scores the new expenses with
+        robust_z_scores and stores the results with one UPDATE. Users get one notification with their new
+        unusual expenses."""
+        date_from = fields.Date.context_today(self) - relativedelta(months=ANOMALY_HISTORY_MONTHS)
+        self.flush_model()
+        self.env.cr.execute(f"""
+            SELECT array_agg(id), array_agg(user_id), array_agg(category), array_agg(currency_id),
+                   array_agg(amount), array_agg(COALESCE(anomaly_checked, false))
+            FROM {self._table}
+            WHERE user_id = ANY(%s) AND active
+              AND (date >= %s OR NOT COALESCE(anomaly_checked, false))
+        """, (list(user_ids), date_from))
+        ids, users, categories, currencies, amounts, checked = self.env.cr.fetchone()
+        if not ids:
+            return
+
+        ids, users, amounts, checked = np.array(ids), np.array(users), np.array(amounts, dtype=float), np.array(checked)
+        # One integer key per (user, category, currency)
+        keys = np.stack([users, np.array(categories, dtype=float), np.array(currencies, dtype=float)], axis=1)
+        _, groups = np.unique(np.nan_to_num(keys, nan=0), axis=0, return_inverse=True)
+        scores = robust_z_scores(groups.ravel(), amounts, ANOMALY_MIN_HISTORY)
+
+        new = ~checked
+        flags = scores[new] > ANOMALY_THRESHOLD
+        self.env.cr.execute(f"""
+            UPDATE {self._table} e
+            SET anomaly_checked = true, anomaly_score = v.score, is_anomaly = v.flag
+            FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::float[]) AS score, unnest(%s::bool[]) AS flag) v
+            WHERE e.id = v.id
+        """, (ids[new].tolist(), np.round(scores[new], 2).tolist(), flags.tolist()))
+        self.invalidate_model(["anomaly_checked", "anomaly_score", "is_anomaly"])
+
+        flagged_users, flagged_counts = np.unique(users[new][flags], return_counts=True)
+        for user_id, count in zip(flagged_users.tolist(), flagged_counts.tolist()):
+            notification(self.with_user(user_id), "Gastos inusuales",
+                         f"Se detectaron {count} gastos inusuales respecto a su historial en la misma categoría.",
+                         "warning")
+
+    @api.model
+    def _create_batch(self, vals_list):
+        """Creates many expenses with one INSERT (used by the statement importer).
+
+        vals_list must be already validated and cleaned. Unlike create(), account balances are NOT updated and the
+        dashboard is NOT recalculated: the caller does it once for the whole batch (one delta per account).
+        """
+        return super().create(vals_list)
     
+    @profiled
+    @instrumented
     def write(self, vals):
         for rec in self:
             # Check date is not in the future
@@ -263,16 +375,21 @@ class Expense(models.Model):
         
         return expense
     
+    @profiled
+    @instrumented
     def unlink(self): 
+        # Update the amount in the accounts or in the budgets, once per account or budget
+        account_amounts = defaultdict(float)
+        budget_amounts = defaultdict(float)
         for rec in self:
-            # Update the amount in the account or in the budget
-            existing_account = rec.account
-            existing_budget = rec.budget
-
-            if existing_account:
-                update_balance(existing_account, rec.amount)
-            elif existing_budget:
-                update_balance(existing_budget, rec.amount * -1, "expended")
+            if rec.account:
+                account_amounts[rec.account] += rec.amount
+            elif rec.budget:
+                budget_amounts[rec.budget] += rec.amount
+        for account, amount in account_amounts.items():
+            update_balance(account, amount)
+        for budget, amount in budget_amounts.items():
+            update_balance(budget, amount * -1, "expended")
         
         if len(self) < 2:
             notification(self, "Gasto eliminado",
@@ -0,0 +1,135 @@
+import numpy as np
+from odoo import fields, models, api, tools
+from dateutil.relativedelta import relativedelta
+
+# Full months of history used for the per-category averages
+FORECAST_HISTORY_MONTHS = 12
+# Average length of a month in days, to spread the monthly averages over the daily array
+DAYS_PER_MONTH = 365.25 / 12
+
+
+class Forecast(models.AbstractModel):
+    _name = "cashmind.forecast"
+
+    @api.model
+    def get_cashflow_forecast(self, months=3):
+        """Projected balance of every account of the current user, day by day, for the next months.
+
+        Returns {"dates": [...], "accounts": [{"id", "name", "currency", "balance": [...]}]}, with one balance per
+        date (the first date is today, with the current balance). The result is cached per user until one of
+        their accounts, movements or recurring schedules changes.
+        """
+        today = fields.Date.context_today(self)
+        return self._compute_cashflow_forecast(self.env.uid, int(months), today, self._get_forecast_version())
+
+    @api.model
+    def _get_forecast_version(self):
+        """Last recalculation of the dashboard of the current user (part of the cache key).
+
+        Every change of an account, a movement or a recurring schedule recalculates the dashboard of its user, so
+        its write_date is enough to tell whether the forecast changed, with a single row read (the same version
+        as get_dashboard_cards).
+        """
+        dashboard = self.env["cashmind.dashboard"].sudo().search([("user_id", "=", self.env.uid)], limit=1)
+        return str(dashboard.write_date)
+
+    @tools.ormcache("user_id", "months", "today", "version")
+    def _compute_cashflow_forecast(self, user_id, months, today, version):
+        # Do not modify the returned value: it's shared by every call with the same key
+        accounts = self.env["cashmind.account"].search([("user_id", "=", user_id)])
+        end = today + relativedelta(months=months)
+        days = (end - today).days + 1
+        dates = [fields.Date.to_string(today + relativedelta(days=i)) for i in range(days)]
+        if not accounts:
+            return {"dates": dates, "accounts": []}
+
+        index = {account.id: i for i, account in enumerate(accounts)}
+        # delta[account, day] = net change of the balance of the account on that day
+        delta = np.zeros((len(accounts), days))
+
+        # 1) Scheduled recurring items, on their exact dates
+        rows, columns, amounts, recurring_keys = self._get_recurring_deltas(user_id, index, today, end)
+        if amounts:
+            np.add.at(delta, (np.array(rows), np.array(columns)), np.array(amounts))
+
+        # 2) Historical averages per account and category, spread evenly over every day
+        daily_rates = np.zeros(len(accounts))
+        for (account_id, category_id), monthly_average in self._get_category_averages(user_id, today).items():
+            if account_id in index and (account_id, category_id) not in recurring_keys:
+                daily_rates[index[account_id]] += monthly_average / DAYS_PER_MONTH
+        delta[:, 1:] += daily_rates[:, None]
+
+        balances = accounts.mapped("balance")
+        projection = np.round(np.array(balances)[:, None] + np.cumsum(delta, axis=1), 2)
+        return {
+            "dates": dates,
+            "accounts": [{
+                "id": account.id,
+                "name": account.name,
+                "currency": account.currency_id.name,
+                "balance": projection[i].tolist(),
+            } for i, account in enumerate(accounts)],
+        }
+
+    @api.model
+    def _get_recurring_deltas(self, user_id, index, today, end):
+        """Occurrences of the recurring schedules between tomorrow and end, as (rows, columns, amounts) of the daily
+        array, plus the (account, category) pairs already covered by a schedule (left out of the averages)."""
+        rows, columns, amounts, recurring_keys = [], [], [], set()
+        schedules = self.env["cashmind.recurring"].search([
+            ("user_id", "=", user_id),
+            ("next_date", "!=", False),
+            ("next_date", "<=", end)])
+        for schedule in schedules:
+            if schedule.target_model == "cashmind.income":
+                moves = [(schedule.account.id, schedule.amount)]
+            elif schedule.target_model == "cashmind.expense":
+                # Expenses of a budget don't change the balance of the account
+                moves = [(schedule.account.id, -schedule.amount)] if schedule.account else []
+            elif schedule.target_model == "cashmind.transfer":
+                # The amount is in the currency of the source account: converted for the destination if it differs
+                destination_amount = schedule.amount
+                if schedule.destination_account.currency_id != schedule.account.currency_id:
+                    converted, _ = self.env["res.currency"]._cashmind_convert_amounts(
+                        [schedule.amount], [schedule.account.currency_id.id],
+                        schedule.destination_account.currency_id.id, today)
+                    destination_amount = 0.0 if np.isnan(converted[0]) else float(converted[0])
+                moves = [(schedule.account.id, -schedule.amount),
+                         (schedule.destination_account.id, destination_amount)]
+            else:
+                moves = [(schedule.account.id, -schedule.amount)]
+            if schedule.category:
+                recurring_keys.add((schedule.account.id, schedule.category.id))
+
+            count = schedule.occurrence_count
+            occurrence_date = schedule._get_occurrence_date(count)
+            while occurrence_date <= end and (not schedule.end_date or occurrence_date <= schedule.end_date):
+                # Occurrences due today or before are created by the cron, but not yet applied to the balance
+                column = max((occurrence_date - today).days, 1)
+                for account_id, amount in moves:
+                    if account_id in index:
+                        rows.append(index[account_id])
+                        columns.append(column)
+                        amounts.append(amount)
+                count += 1
+                occurrence_date = schedule._get_occurrence_date(count)
+        return rows, columns, amounts, recurring_keys
+
+    @api.model
+    def _get_category_averages(self, user_id, today):
+        """Average monthly net amount per (account, category) over the last full months of history.
+
+        One grouped query per model. Balance adjustments (AJUSTE DE SALDO) are not part of the forecast.
+        """
+        date_from = today.replace(day=1) - relativedelta(months=FORECAST_HISTORY_MONTHS)
+        date_to = today.replace(day=1) - relativedelta(days=1)
+        averages = {}
+        for model, sign in (("cashmind.income", 1), ("cashmind.expense", -1)):
+            grouped = self.env[model]._read_group(
+                [("user_id", "=", user_id), ("date", ">=", date_from), ("date", "<=", date_to),
+                 ("account", "!=", False), ("category.category_type", "!=", "NA")],
+                ["account", "category"], ["amount:sum"])
+            for account, category, total in grouped:
+                key = (account.id, category.id)
+                averages[key] = averages.get(key, 0.0) + sign * total / FORECAST_HISTORY_MONTHS
+        return averages
@@ -1,12 +1,14 @@
 from odoo import fields, models, api
 from odoo.exceptions import ValidationError
-from ..utils import notification, update_balance, clean_input
+from ..utils import notification, update_balance, clean_input, get_month_label, get_quarter_label, set_movement_fingerprint
+from ..instrumentation import instrumented, profiled
 from datetime import datetime
+from collections import defaultdict
 
 class Income(models.Model): 
     _name = "cashmind.income"
     
-    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", unique=True,
+    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", unique=True, index=True,
                               default=lambda self: self.env.user)
     name = fields.Char(string="Nombre", required=True)
     account = fields.Many2one("cashmind.account", string="Cuenta de destino", required=True, domain="[('user_id', '=', uid)]")
@@ -17,16 +19,25 @@ class Income(models.Model):
     currency_id = fields.Many2one("res.currency", string="Moneda", readonly=True, 
                                   store=True, compute="_compute_currency", default=lambda self: self._default_currency())
     amount = fields.Monetary(string="Cantidad", currency_field="currency_id", required=True)
-    date = fields.Date(string="Fecha", default=datetime.today(), required=True)
+    date = fields.Date(string="Fecha", default=datetime.today(), required=True, index=True)
     invoice = fields.Binary(string="Factura")
     has_invoice = fields.Boolean(string="Con factura", compute="_compute_has_invoice", store=True)
+    month = fields.Char(string="Mes", compute="_compute_period", store=True, index=True)
+    quarter = fields.Char(string="Trimestre", compute="_compute_period", store=True)
+    fingerprint = fields.Char(string="Huella de importación", readonly=True, copy=False)
+    possible_duplicate = fields.Boolean(string="Posible duplicado", readonly=True, copy=False)
+
     note = fields.Text(string="Nota")
     active = fields.Boolean(string="Mostrar", default=True)
 
+    _sql_constraints = [
+        ("fingerprint_user_unique", "unique(user_id, fingerprint)",
+         "Este movimiento ya fue importado anteriormente desde un extracto bancario."),
+    ]
+
     @api.model
     def _default_currency(self):
-        currency = self.env["res.currency"].search([("name", "=", "EUR")], limit=1)
-        return currency.id if currency else False
+        return self.env["res.currency"]._cashmind_currency_id("EUR")
 
     @api.onchange("account")
     def _compute_availability(self):
@@ -42,7 +53,15 @@ class Income(models.Model):
     def _compute_has_invoice(self):
         for rec in self:
             rec.has_invoice = bool(rec.invoice)
+
+    @api.depends("date")
+    def _compute_period(self):
+        for rec in self:
+            rec.month = get_month_label(rec.date) if rec.date else False
+            rec.quarter = get_quarter_label(rec.date) if rec.date else False
     
+    @profiled
+    @instrumented
     def create(self, vals):
         if isinstance(vals, list):
             vals = vals[0]
@@ -71,6 +90,14 @@ class Income(models.Model):
         if note:
             vals["note"] = note
 
+        # Category missing: use the categorization rules of the user
+        if not vals.get("category") and name:
+            vals["category"] = self.env["cashmind.category_rule"].match_category(
+                name, vals.get("amount"), vals.get("account"), "income")
+
+        # Same duplicate detection as the statement importer
+        set_movement_fingerprint(self, vals)
+
         income = super().create(vals)
 
         update_balance(income.account, income.amount)
@@ -78,13 +105,34 @@ class Income(models.Model):
                     "Se actualizó correctamente el saldo de la cuenta asociada a este ingreso.",
                     "success")
         
-        # Recalculate dashboard stats
-        user_id = income.user_id.id
-        dashboards = self.env['cashmind.dashboard'].search([('user_id', '=', user_id)])
-        dashboards.recalculate_dashboard()
+        # Recalculate dashboard stats (unless the caller does it once for many records)
+        if not self.env.context.get("defer_dashboard"):
+            user_id = income.user_id.id
+            dashboards = self.env['cashmind.dashboard'].search([('user_id', '=', user_id)])
+            dashboards.recalculate_dashboard()
         
         return income
+
+    @api.model
+    def _get_existing_fingerprints(self, fingerprints):
+        """Fingerprints (of the list given) already imported by the current user, with a single query."""
+        self.env.cr.execute(f"""
+            SELECT fingerprint FROM {self._table}
+            WHERE user_id = %s AND fingerprint = ANY(%s)
+        """, (self.env.uid, list(fingerprints)))
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _create_batch(self, vals_list):
+        """Creates many incomes with one INSERT (used by the statement importer).
+
+        vals_list must be already validated and cleaned. Unlike create(), account balances are NOT updated and the
+        dashboard is NOT recalculated: the caller does it once for the whole batch (one delta per account).
+        """
+        return super().create(vals_list)
     
+    @profiled
+    @instrumented
     def write(self, vals):
         for rec in self:
             # Check if date is maximum today
@@ -164,13 +212,15 @@ class Income(models.Model):
 
         return income 
 
+    @profiled
+    @instrumented
     def unlink(self):
+        # Update the amount in the accounts, once per account
+        amounts = defaultdict(float)
         for rec in self:
-            current_amount_income = rec.amount
-            current_account_record = rec.account
-            
-            # Update the amount in the account
-            update_balance(current_account_record, current_amount_income * -1)
+            amounts[rec.account] += rec.amount
+        for account, amount in amounts.items():
+            update_balance(account, amount * -1)
         
         if len(self) < 2:
             notification(self, "Ingreso eliminado",
@@ -0,0 +1,24 @@
+from odoo import fields, models, api
+from dateutil.relativedelta import relativedelta
+
+# Days the metrics are kept (older ones are deleted by the autovacuum)
+METRICS_RETENTION_DAYS = 30
+
+
+class Metric(models.Model):
+    _name = "cashmind.metric"
+    _order = "create_date desc, id desc"
+
+    # Written by instrumentation.py: one row per operation and transaction, with the totals of all its calls
+    user_id = fields.Many2one("res.users", string="Usuario", readonly=True, index=True, ondelete="cascade")
+    request = fields.Char(string="Petición", readonly=True)
+    operation = fields.Char(string="Operación", readonly=True, index=True)
+    calls = fields.Integer(string="Llamadas", readonly=True)
+    duration_ms = fields.Float(string="Tiempo (ms)", readonly=True, digits=(16, 1))
+    queries = fields.Integer(string="Consultas SQL", readonly=True)
+    http_calls = fields.Integer(string="Llamadas HTTP", readonly=True)
+
+    @api.autovacuum
+    def _gc_metrics(self):
+        limit_date = fields.Datetime.now() - relativedelta(days=METRICS_RETENTION_DAYS)
+        self.search([("create_date", "<", limit_date)]).unlink()
@@ -0,0 +1,140 @@
+from odoo import fields, models, api, tools
+
+# Columns of the movement history export (see controllers/main.py)
+EXPORT_COLUMNS = ["Fecha", "Tipo de movimiento", "Nombre", "Cuenta", "Categoría", "Cantidad", "Moneda"]
+
+
+class Movement(models.Model):
+    _name = "cashmind.movement"
+    _auto = False
+    _order = "date desc, id desc"
+
+    # Read-only reporting model: one row per money movement of income, expense, transfer, transfer_external
+    # and save, all of them with the same shape. The amount is signed from the point of view of user_id
+    # (positive if the money comes into the account, negative if it goes out)
+    name = fields.Char(string="Nombre", readonly=True)
+    user_id = fields.Many2one("res.users", string="Usuario", readonly=True)
+    date = fields.Date(string="Fecha", readonly=True)
+    month = fields.Char(string="Mes", readonly=True)
+    quarter = fields.Char(string="Trimestre", readonly=True)
+    kind = fields.Selection([
+        ("income", "Ingreso"),
+        ("expense", "Gasto"),
+        ("transfer_out", "Transferencia enviada"),
+        ("transfer_in", "Transferencia recibida"),
+        ("transfer_external_sent", "Transferencia externa enviada"),
+        ("transfer_external_received", "Transferencia externa recibida"),
+        ("save", "Ahorro"),
+        ], string="Tipo de movimiento", readonly=True)
+    account_id = fields.Many2one("cashmind.account", string="Cuenta", readonly=True)
+    category_id = fields.Many2one("cashmind.category", string="Categoría", readonly=True)
+    budget_id = fields.Many2one("cashmind.budget", string="Presupuesto", readonly=True)
+    savinggoal_id = fields.Many2one("cashmind.savinggoal", string="Meta de ahorro", readonly=True)
+    currency_id = fields.Many2one("res.currency", string="Moneda", readonly=True)
+    amount = fields.Monetary(string="Cantidad", currency_field="currency_id", readonly=True)
+    res_model = fields.Char(string="Modelo", readonly=True)
+    res_id = fields.Integer(string="ID del registro", readonly=True)
+    active = fields.Boolean(string="Mostrar", readonly=True)
+
+    def init(self):
+        # The id is built from the id of the original record and the kind of movement (1 to 7),
+        # so it is stable between queries and unique for the whole view.
+        # month and quarter use the same format as cashmind.income and cashmind.expense (YYYY-MM, YYYY-TN)
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT m.*, to_char(m.date, 'YYYY-MM') AS month, to_char(m.date, 'YYYY-"T"Q') AS quarter
+                FROM (
+                    SELECT i.id * 10 + 1 AS id, i.name, i.user_id, i.date, 'income' AS kind,
+                           i.account AS account_id, i.category AS category_id, NULL::integer AS budget_id,
+                           NULL::integer AS savinggoal_id, i.currency_id, i.amount AS amount,
+                           'cashmind.income' AS res_model, i.id AS res_id, i.active
+                    FROM cashmind_income i
+                    UNION ALL
+                    SELECT e.id * 10 + 2, e.name, e.user_id, e.date, 'expense',
+                           COALESCE(e.account, b.account), e.category, e.budget,
+                           NULL, e.currency_id, -e.amount,
+                           'cashmind.expense', e.id, e.active
+                    FROM cashmind_expense e
+                    LEFT JOIN cashmind_budget b ON b.id = e.budget
+                    UNION ALL
+                    SELECT t.id * 10 + 3, t.name, t.user_id, t.transfer_date, 'transfer_out',
+                           t.source_account, NULL, NULL,
+                           NULL, t.source_currency_id, -t.amount,
+                           'cashmind.transfer', t.id, t.active
+                    FROM cashmind_transfer t
+                    UNION ALL
+                    SELECT t.id * 10 + 4, t.name, t.user_id, t.transfer_date, 'transfer_in',
+                           t.destination_account, NULL, NULL,
+                           NULL, t.destination_currency_id, t.amount,
+                           'cashmind.transfer', t.id, t.active
+                    FROM cashmind_transfer t
+                    UNION ALL
+                    SELECT te.id * 10 + 5, te.name, te.user_id, te.transfer_date, 'transfer_external_sent',
+                           te.source_account, NULL, NULL,
+                           NULL, te.source_currency_id, -te.amount,
+                           'cashmind.transfer_external', te.id, te.active
+                    FROM cashmind_transfer_external te
+                    UNION ALL
+                    SELECT te.id * 10 + 6, te.name, te.external_user_id, te.transfer_date, 'transfer_external_received',
+                           te.destination_account, NULL, NULL,
+                           NULL, te.destination_currency_id, te.amount,
+                           'cashmind.transfer_external', te.id, te.active
+                    FROM cashmind_transfer_external te
+                    UNION ALL
+                    SELECT s.id * 10 + 7, s.name, s.user_id, s.date, 'save',
+                           s.source_account, NULL, NULL,
+                           s.destination_savinggoal_account, s.source_currency_id, -s.amount,
+                           'cashmind.save', s.id, s.active
+                    FROM cashmind_save s
+                ) m
+            )
+        """)
+
+    @api.model
+    def _iter_export_rows(self, date_from=None, date_to=None, chunk_size=5000):
+        """Yields the movements of the current user as lists of rows (EXPORT_COLUMNS), chunk_size rows at a time.
+
+        Every kind of movement is read in id windows (res_id > last res_id seen), so each chunk is an indexed
+        query, the memory used doesn't depend on the size of the history and binary columns are never read.
+        """
+        kinds = dict(self._fields["kind"].selection)
+        where = ["m.user_id = %s", "m.kind = %s", "m.res_id > %s", "m.active"]
+        params = [self.env.uid]
+        if date_from:
+            where.append("m.date >= %s")
+        if date_to:
+            where.append("m.date <= %s")
+        query = f"""
+            SELECT m.res_id, m.date, m.name, a.name, c.name, m.amount, cur.name
+            FROM {self._table} m
+            LEFT JOIN cashmind_account a ON a.id = m.account_id
+            LEFT JOIN cashmind_category c ON c.id = m.category_id
+            LEFT JOIN res_currency cur ON cur.id = m.currency_id
+            WHERE {" AND ".join(where)}
+            ORDER BY m.res_id
+            LIMIT %s
+        """
+        dates = [d for d in (date_from, date_to) if d]
+        for kind, kind_label in kinds.items():
+            last_id = 0
+            while True:
+                self.env.cr.execute(query, params + [kind, last_id] + dates + [chunk_size])
+                rows = self.env.cr.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                yield [[date, kind_label, name, account, category, amount, currency]
+                       for _, date, name, account, category, amount, currency in rows]
+                if len(rows) < chunk_size:
+                    break
+
+    def action_open_record(self):
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self.res_model,
+            "res_id": self.res_id,
+            "view_mode": "form",
+            "target": "current",
+        }
@@ -0,0 +1,249 @@
+from odoo import fields, models, api
+from odoo.exceptions import ValidationError, UserError
+from dateutil.relativedelta import relativedelta
+from ..utils import clean_input, notification
+import logging
+
+# Max occurrences materialized for one schedule in a single run (catch-up after a long downtime)
+MAX_CATCH_UP = 366
+
+FREQUENCY_UNITS = {
+    "daily": "days",
+    "weekly": "weeks",
+    "monthly": "months",
+    "yearly": "years",
+}
+
+_logger = logging.getLogger(__name__)
+
+
+class Recurring(models.Model):
+    _name = "cashmind.recurring"
+    _order = "next_date, id"
+
+    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", index=True,
+                              default=lambda self: self.env.user)
+    name = fields.Char(string="Nombre", required=True)
+    target_model = fields.Selection([
+        ("cashmind.income", "Ingreso"),
+        ("cashmind.expense", "Gasto"),
+        ("cashmind.transfer", "Transferencia"),
+        ("cashmind.save", "Ahorro"),
+        ], string="Tipo de movimiento", required=True, default="cashmind.expense")
+
+    # Schedule (rrule-style: every <interval> <frequency> from start_date until end_date)
+    frequency = fields.Selection([
+        ("daily", "Diaria"),
+        ("weekly", "Semanal"),
+        ("monthly", "Mensual"),
+        ("yearly", "Anual"),
+        ], string="Frecuencia", required=True, default="monthly")
+    interval = fields.Integer(string="Cada", required=True, default=1)
+    start_date = fields.Date(string="Primera fecha", required=True, default=lambda self: fields.Date.context_today(self))
+    end_date = fields.Date(string="Última fecha")
+    occurrence_count = fields.Integer(string="Movimientos generados", readonly=True, default=0, copy=False)
+    next_date = fields.Date(string="Próxima fecha", compute="_compute_next_date", store=True, index=True)
+    last_error = fields.Text(string="Último error", readonly=True, copy=False)
+
+    # Template of the movement created on every occurrence
+    account = fields.Many2one("cashmind.account", string="Cuenta", domain="[('user_id', '=', uid)]")
+    budget = fields.Many2one("cashmind.budget", string="Presupuesto", domain="[('user_id', '=', uid)]")
+    destination_account = fields.Many2one("cashmind.account", string="Cuenta de destino", domain="[('user_id', '=', uid)]")
+    savinggoal = fields.Many2one("cashmind.savinggoal", string="Meta de ahorro", domain="[('user_id', '=', uid)]")
+    category = fields.Many2one("cashmind.category", string="Categoría", domain="[('user_id', '=', uid)]")
+    currency_id = fields.Many2one("res.currency", string="Moneda", compute="_compute_currency")
+    amount = fields.Monetary(string="Cantidad", currency_field="currency_id", required=True)
+    note = fields.Text(string="Nota")
+    active = fields.Boolean(string="Mostrar", default=True)
+
+    @api.depends("account", "budget")
+    def _compute_currency(self):
+        for rec in self:
+            rec.currency_id = rec.account.currency_id or rec.budget.currency_id
+
+    @api.depends("start_date", "end_date", "frequency", "interval", "occurrence_count")
+    def _compute_next_date(self):
+        for rec in self:
+            next_date = rec._get_occurrence_date(rec.occurrence_count) if rec.start_date else False
+            rec.next_date = next_date if next_date and (not rec.end_date or next_date <= rec.end_date) else False
+
+    @api.constrains("interval", "amount", "start_date", "end_date")
+    def _check_schedule(self):
+        for rec in self:
+            if rec.interval <= 0:
+                raise ValidationError("La frecuencia debe repetirse al menos cada 1 periodo.")
+            if rec.amount <= 0:
+                raise ValidationError("La cantidad del movimiento recurrente debe ser mayor que 0.")
+            if rec.end_date and rec.end_date < rec.start_date:
+                raise ValidationError("La última fecha no puede ser anterior a la primera fecha.")
+
+    def _get_occurrence_date(self, index):
+        """Date of the occurrence number index (0 = start_date).
+
+        Always computed from start_date, so monthly schedules starting on the 31st don't drift to the 28th.
+        """
+        self.ensure_one()
+        return self.start_date + relativedelta(**{FREQUENCY_UNITS[self.frequency]: self.interval * index})
+
+    def _prepare_occurrence_vals(self, occurrence_date):
+        """Values to create the movement of one occurrence, through the create() of the target model."""
+        self.ensure_one()
+        date_string = fields.Date.to_string(occurrence_date)
+        vals = {
+            "user_id": self.user_id.id,
+            "name": f"{self.name} {date_string}",
+            "amount": self.amount,
+            "note": self.note or False,
+        }
+        if self.target_model == "cashmind.income":
+            vals.update({"account": self.account.id, "category": self.category.id, "date": date_string})
+        elif self.target_model == "cashmind.expense":
+            if self.budget:
+                vals.update({"budget": self.budget.id})
+            else:
+                vals.update({"account": self.account.id})
+            vals.update({"category": self.category.id, "date": date_string})
+        elif self.target_model == "cashmind.transfer":
+            vals.update({"source_account": self.account.id, "destination_account": self.destination_account.id,
+                         "transfer_date": date_string})
+        elif self.target_model == "cashmind.save":
+            vals.update({"source_account": self.account.id, "destination_savinggoal_account": self.savinggoal.id,
+                         "date": date_string})
+        return vals
+
+    def _materialize_due(self, today):
+        """Creates the movements of every occurrence due until today (catching up missed ones).
+
+        Every occurrence is created and counted in the same transaction, so a retry after an error never creates
+        the same occurrence twice. Dashboards are not recalculated here (defer_dashboard): the caller does it once
+        per user. Returns (set of users with new movements, ids of the schedules that failed).
+        """
+        users = set()
+        failed_ids = []
+        for rec in self:
+            try:
+                with self.env.cr.savepoint():
+                    count = rec.occurrence_count
+                    Model = self.env[rec.target_model].with_user(rec.user_id).with_context(defer_dashboard=True)
+                    created = 0
+                    while created < MAX_CATCH_UP:
+                        occurrence_date = rec._get_occurrence_date(count)
+                        if occurrence_date > today or (rec.end_date and occurrence_date > rec.end_date):
+                            break
+                        Model.create(rec._prepare_occurrence_vals(occurrence_date))
+                        count += 1
+                        created += 1
+                    if created:
+                        rec.write({"occurrence_count": count, "last_error": False})
+                        users.add(rec.user_id.id)
+            except (ValidationError, UserError) as e:
+                rec.write({"last_error": str(e) or type(e).__name__})
+                failed_ids.append(rec.id)
+            except Exception as e:
+                # Any other error only skips this schedule (rolled back to the savepoint): the others still run
+                _logger.exception("Recurring schedule %s could not be materialized", rec.id)
+                rec.write({"last_error": str(e) or type(e).__name__})
+                failed_ids.append(rec.id)
+        return users, failed_ids
+
+    @api.model
+    def _cron_generate_occurrences(self, batch_size=500, auto_commit=True):
+        """Materializes all the due occurrences, batch_size schedules at a time."""
+        today = fields.Date.context_today(self)
+        Recurring = self.sudo()
+        failed_ids = []
+        while True:
+            schedules = Recurring.search([
+                ("next_date", "!=", False),
+                ("next_date", "<=", today),
+                ("id", "not in", failed_ids)], limit=batch_size)
+            if not schedules:
+                break
+            users, batch_failed_ids = schedules._materialize_due(today)
+            # Failed schedules (e.g. not enough balance) are retried on the next run
+            failed_ids += batch_failed_ids
+
+            # Recalculate dashboard stats, once per user for the whole batch
+            dashboards = self.env["cashmind.dashboard"].sudo().search([("user_id", "in", list(users))])
+            dashboards.recalculate_dashboard()
+            if auto_commit:
+                self.env.cr.commit()
+        return True
+
+    def create(self, vals):
+        if isinstance(vals, list):
+            vals = vals[0]
+        name = clean_input(vals["name"], "title") if "name" in vals else None
+        note = clean_input(vals["note"], "note") if "note" in vals and vals["note"] else None
+        self._check_template(vals)
+        vals["name"] = name.lower().capitalize() if name else None
+        if note:
+            vals["note"] = note
+        recurring = super().create(vals)
+        recurring._recalculate_dashboards()
+        return recurring
+
+    def write(self, vals):
+        if "name" in vals and vals["name"]:
+            vals["name"] = clean_input(vals["name"], "title").lower().capitalize()
+        if "note" in vals and vals["note"]:
+            vals["note"] = clean_input(vals["note"], "note")
+        recurring = super().write(vals)
+        for rec in self:
+            rec._check_template(rec._read_template())
+        # The progress written while materializing is followed by one recalculation per user (see the cron)
+        if set(vals) - {"occurrence_count", "last_error"}:
+            self._recalculate_dashboards()
+        return recurring
+
+    def unlink(self):
+        dashboards = self.env["cashmind.dashboard"].search([("user_id", "in", self.user_id.ids)])
+        recurring = super().unlink()
+        dashboards.recalculate_dashboard()
+        return recurring
+
+    def _recalculate_dashboards(self):
+        # The forecast of the user is cached until their dashboard changes (cashmind.forecast)
+        dashboards = self.env["cashmind.dashboard"].search([("user_id", "in", self.user_id.ids)])
+        dashboards.recalculate_dashboard()
+
+    def _read_template(self):
+        self.ensure_one()
+        return {
+            "target_model": self.target_model,
+            "account": self.account.id,
+            "budget": self.budget.id,
+            "destination_account": self.destination_account.id,
+            "savinggoal": self.savinggoal.id,
+            "category": self.category.id,
+        }
+
+    @api.model
+    def _check_template(self, vals):
+        target_model = vals.get("target_model", "cashmind.expense")
+        if target_model == "cashmind.expense":
+            if not vals.get("account") and not vals.get("budget"):
+                raise ValidationError("Debe seleccionar una cuenta o un presupuesto de origen para este gasto recurrente.")
+            if vals.get("account") and vals.get("budget"):
+                raise ValidationError("Debe seleccionar solamente una cuenta de origen para este gasto recurrente.")
+        elif not vals.get("account"):
+            raise ValidationError("Debe seleccionar una cuenta para este movimiento recurrente.")
+        if target_model in ("cashmind.income", "cashmind.expense") and not vals.get("category"):
+            raise ValidationError("Debe seleccionar una categoría para este movimiento recurrente.")
+        if target_model == "cashmind.transfer" and not vals.get("destination_account"):
+            raise ValidationError("Debe seleccionar una cuenta de destino para esta transferencia recurrente.")
+        if target_model == "cashmind.save" and not vals.get("savinggoal"):
+            raise ValidationError("Debe seleccionar una meta de ahorro para este ahorro recurrente.")
+
+    def action_generate_now(self):
+        """Creates now the movements due until today of the selected schedules."""
+        users, failed_ids = self._materialize_due(fields.Date.context_today(self))
+        dashboards = self.env["cashmind.dashboard"].search([("user_id", "in", list(users))])
+        dashboards.recalculate_dashboard()
+        errors = self.browse(failed_ids)
+        if errors:
+            notification(self, "Movimientos recurrentes", errors[0].last_error, "warning")
+        else:
+            notification(self, "Movimientos recurrentes", "Se generaron correctamente los movimientos pendientes.",
+                         "success")
+        return True
@@ -0,0 +1,347 @@
+import numpy as np
+from odoo import fields, models, api, tools
+from odoo.exceptions import UserError
+from collections import defaultdict
+from odoo.tools.sql import create_index
+from dateutil.relativedelta import relativedelta
+from ..utils import fetch_latest_rates, fetch_rate_series, get_last_month_range
+import logging
+
+# Rates older than this are still used for the conversions, but the dashboard shows them as outdated (the API
+# doesn't publish rates on weekends and holidays)
+RATE_MAX_AGE_DAYS = 4
+# Days of history downloaded with every request to the exchange rate API
+RATE_HISTORY_CHUNK_DAYS = 365
+
+_logger = logging.getLogger(__name__)
+
+
+class ResCurrency(models.Model):
+    _inherit = "res.currency"
+
+    @tools.ormcache(cache="stable")
+    def _cashmind_get_currency_map(self):
+        """({code: id}, {id: code}) of every currency, active or not.
+
+        Kept in the "stable" cache, which is only cleared when a currency is created, renamed or deleted, or
+        when a rate changes.
+        """
+        # Do not modify the returned value: it's shared by every call
+        self.flush_model(["name"])
+        self.env.cr.execute("SELECT id, name FROM res_currency")
+        rows = self.env.cr.fetchall()
+        return {name: currency_id for currency_id, name in rows}, {currency_id: name for currency_id, name in rows}
+
+    @api.model
+    def _cashmind_currency_id(self, code):
+        """Id of the currency with this code (e.g. "EUR"), or False. No query once the map is cached."""
+        return self._cashmind_get_currency_map()[0].get(code, False)
+
+    @api.model
+    def _cashmind_currency_code(self, currency_id):
+        """Code of the currency with this id, or False. No query once the map is cached."""
+        return self._cashmind_get_currency_map()[1].get(currency_id, False)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        currencies = super().create(vals_list)
+        self.env.registry.clear_cache("stable")
+        return currencies
+
+    def write(self, vals):
+        currencies = super().write(vals)
+        if "name" in vals:
+            self.env.registry.clear_cache("stable")
+        return currencies
+
+    def unlink(self):
+        currencies = super().unlink()
+        self.env.registry.clear_cache("stable")
+        return currencies
+
+    @tools.ormcache("company_id", "rate_date", cache="stable")
+    def _cashmind_get_rate_matrix(self, company_id, rate_date):
+        """Conversion matrix between every currency with a known rate on rate_date (the last one stored before).
+
+        Returns (index, matrix, dates): index is {currency_id: position}, matrix[i, j] converts one unit of
+        currency i into currency j, and dates[i] is the date of the rate of currency i. Rates are units of the
+        currency per unit of the company currency (res.currency.rate), so the company currency is always 1.
+        Kept in the "stable" cache, which is cleared when a rate is created, changed or deleted (see
+        ResCurrencyRate), so once cached a conversion doesn't run any query.
+        """
+        # Do not modify the returned value: it's shared by every call with the same key
+        company = self.env["res.company"].browse(company_id)
+        self.env["res.currency.rate"].flush_model(["name", "rate", "currency_id", "company_id"])
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (currency_id) currency_id, rate, name
+            FROM res_currency_rate
+            WHERE (company_id = %s OR company_id IS NULL)
+            AND name <= %s
+            ORDER BY currency_id, name DESC, company_id NULLS LAST
+        """, (company.root_id.id, rate_date))
+        rates = {currency_id: (rate, day) for currency_id, rate, day in self.env.cr.fetchall()}
+        rates[company.currency_id.id] = (1.0, rate_date)
+
+        index = {currency_id: i for i, currency_id in enumerate(rates)}
+        vector = np.array([rate for rate, _ in rates.values()])
+        matrix = vector[None, :] / vector[:, None]
+        return index, matrix, [day for _, day in rates.values()]
+
+    @api.model
+    def _cashmind_convert_amounts(self, amounts, from_currency_ids, to_currency_id, rate_date=None):
+        """Converts amounts[i] from from_currency_ids[i] to to_currency_id, all at once with the cached matrix.
+
+        Returns (converted amounts as a numpy array, date of the oldest rate used). Amounts in a currency without
+        a known rate are NaN. Amounts already in to_currency_id are returned as they are.
+        """
+        rate_date = rate_date or fields.Date.context_today(self)
+        index, matrix, dates = self._cashmind_get_rate_matrix(self.env.company.id, rate_date)
+        amounts = np.asarray(amounts, dtype=float)
+        from_currency_ids = np.asarray(from_currency_ids)
+        converted = np.where(from_currency_ids == to_currency_id, amounts, np.nan)
+        if to_currency_id not in index:
+            return converted, None
+
+        rows = np.array([index.get(currency_id, -1) for currency_id in from_currency_ids.tolist()], dtype=int)
+        to_convert = (rows >= 0) & (from_currency_ids != to_currency_id)
+        column = index[to_currency_id]
+        converted[to_convert] = amounts[to_convert] * matrix[rows[to_convert], column]
+        if not to_convert.any():
+            return converted, None
+        return converted, min([dates[row] for row in rows[to_convert].tolist()] + [dates[column]])
+
+    @api.model
+    def _cashmind_rate_sql(self, currency, rate_date):
+        """SQL expression with the last known rate of the currency column on the rate_date column (NULL if none).
+
+        Same rates as _cashmind_get_rate_matrix. The query must be run with the parameters of _cashmind_rate_params.
+        """
+        return f"""(CASE WHEN {currency} = %(rate_company_currency)s THEN 1.0 ELSE (
+            SELECT r.rate FROM res_currency_rate r
+            WHERE r.currency_id = {currency}
+            AND (r.company_id = %(rate_company)s OR r.company_id IS NULL)
+            AND r.name <= {rate_date}
+            ORDER BY r.name DESC, r.company_id NULLS LAST
+            LIMIT 1) END)"""
+
+    @api.model
+    def _cashmind_rate_params(self):
+        """Parameters of _cashmind_rate_sql. The pending rates are flushed, so the query sees them."""
+        self.env["res.currency.rate"].flush_model(["name", "rate", "currency_id", "company_id"])
+        return {
+            "rate_company": self.env.company.root_id.id,
+            "rate_company_currency": self.env.company.currency_id.id,
+        }
+
+    @api.model
+    def _cashmind_get_used_currency_codes(self):
+        """Codes of the currencies of every account, budget, saving goal and dashboard."""
+        self.env.cr.execute("""
+            SELECT name FROM res_currency WHERE id IN (
+                SELECT currency_id FROM cashmind_account
+                UNION SELECT currency_id FROM cashmind_budget
+                UNION SELECT currency_id FROM cashmind_savinggoal
+                UNION SELECT currency_id FROM cashmind_dashboard
+            )
+        """)
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _cashmind_get_used_currency_pairs(self):
+        """Distinct (company, from currency, to currency) of every user: the currency of each of their accounts,
+        budgets and saving goals, converted to the currency of their dashboard."""
+        self.env.cr.execute("""
+            SELECT DISTINCT u.company_id, used.currency_id, d.currency_id
+            FROM (
+                SELECT user_id, currency_id FROM cashmind_account
+                UNION SELECT user_id, currency_id FROM cashmind_budget
+                UNION SELECT user_id, currency_id FROM cashmind_savinggoal
+            ) AS used
+            JOIN cashmind_dashboard d ON d.user_id = used.user_id
+            JOIN res_users u ON u.id = used.user_id
+            WHERE used.currency_id != d.currency_id
+        """)
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _cron_prefetch_rates(self, batch_size=500, auto_commit=True):
+        """Downloads the latest rates of every currency pair in use, so no save or dashboard waits for them.
+
+        Rates are stored against the currency of each company, so it's one request per base currency, shared by
+        the companies with the same one. If a rate changed, the dashboards that convert amounts are recalculated,
+        batch_size at a time.
+        """
+        codes_by_company = defaultdict(set)
+        for company_id, from_currency_id, to_currency_id in self._cashmind_get_used_currency_pairs():
+            codes_by_company[company_id].update([self._cashmind_currency_code(from_currency_id),
+                                                 self._cashmind_currency_code(to_currency_id)])
+        companies_by_base = defaultdict(lambda: self.env["res.company"])
+        for company in self.env["res.company"].browse(list(codes_by_company)):
+            companies_by_base[company.currency_id.name] |= company
+
+        changed = 0
+        for base, companies in companies_by_base.items():
+            codes = sorted(set().union(*(codes_by_company[company.id] for company in companies)) - {base})
+            if not codes:
+                continue
+            try:
+                rates_date, rates = fetch_latest_rates(base, codes)
+            except UserError as e:
+                # The last known rates are still used (shown as outdated after a few days)
+                _logger.warning("Exchange rates of %s could not be downloaded: %s", base, e)
+                continue
+            for company in companies:
+                changed += self.with_company(company)._cashmind_store_rates({rates_date: rates})
+        if not changed:
+            return True
+
+        Dashboard = self.env["cashmind.dashboard"].sudo()
+        last_id = 0
+        while True:
+            dashboards = Dashboard.search([
+                ("id", ">", last_id),
+                "|", "|", ("rates_pending", "=", True), ("month_rates_pending", "=", True),
+                ("rates_date", "!=", False)], order="id", limit=batch_size)
+            if not dashboards:
+                break
+            last_id = dashboards[-1].id
+            dashboards.recalculate_dashboard()
+            self.env.add_to_compute(Dashboard._fields["total_income_month"], dashboards)
+            if auto_commit:
+                self.env.cr.commit()
+        return True
+
+    @api.model
+    def _cashmind_fetch_rates(self, currency_codes):
+        """Downloads the latest rates of currency_codes against the company currency (one request to the API) and
+        stores them in res.currency.rate. Returns the number of new or changed rates."""
+        base = self.env.company.currency_id.name
+        codes = sorted(set(currency_codes) - {base})
+        if not codes:
+            return 0
+        rates_date, rates = fetch_latest_rates(base, codes)
+        return self._cashmind_store_rates({rates_date: rates})
+
+    @api.model
+    def _cashmind_store_rates(self, rates_by_date):
+        """Creates or updates the res.currency.rate of the company for {date: {currency code: rate}}.
+
+        Returns the number of new or changed rates.
+        """
+        company = self.env.company.root_id
+        codes = {code for rates in rates_by_date.values() for code in rates}
+        currency_ids = {code: self._cashmind_currency_id(code) for code in codes if self._cashmind_currency_id(code)}
+        Rate = self.env["res.currency.rate"].sudo()
+        existing = {
+            (rate.currency_id.id, rate.name): rate
+            for rate in Rate.search([
+                ("currency_id", "in", list(currency_ids.values())),
+                ("company_id", "=", company.id),
+                ("name", "in", list(rates_by_date))])
+        }
+        to_create = []
+        changed = 0
+        for rates_date, rates in rates_by_date.items():
+            rates_date = fields.Date.to_date(rates_date)
+            for code, value in rates.items():
+                if code not in currency_ids:
+                    continue
+                rate = existing.get((currency_ids[code], rates_date))
+                if rate:
+                    if rate.rate != value:
+                        rate.rate = value
+                        changed += 1
+                else:
+                    to_create.append({"currency_id": currency_ids[code], "company_id": company.id,
+                                      "name": rates_date, "rate": value})
+        Rate.create(to_create)
+        return len(to_create) + changed
+
+    @api.model
+    def _cashmind_is_rate_stale(self, rate_date):
+        return bool(rate_date) and (fields.Date.context_today(self) - rate_date).days > RATE_MAX_AGE_DAYS
+
+    @api.model
+    def _cashmind_load_rate_history(self, currency_codes, date_from):
+        """Downloads and stores the daily rates of currency_codes since date_from, one request per year of history.
+
+        Only the days before the first rate already stored for all of them are requested, so the history is
+        downloaded once. Returns the last day loaded, or None if the history was already complete.
+        """
+        company = self.env.company
+        currencies = self.with_context(active_test=False).search([
+            ("name", "in", list(currency_codes)),
+            ("id", "!=", company.currency_id.id)])
+        if not currencies or not date_from:
+            return None
+        self.env["res.currency.rate"].flush_model(["name", "currency_id", "company_id"])
+        self.env.cr.execute("""
+            SELECT MIN(r.name)
+            FROM res_currency c
+            LEFT JOIN res_currency_rate r ON r.currency_id = c.id AND (r.company_id = %s OR r.company_id IS NULL)
+            WHERE c.id = ANY(%s)
+            GROUP BY c.id
+        """, (company.root_id.id, currencies.ids))
+        first_dates = [row[0] for row in self.env.cr.fetchall()]
+        today = fields.Date.context_today(self)
+        date_to = today if None in first_dates else max(first_dates) - relativedelta(days=1)
+        # A few days before, so the movements of date_from have a rate even if it was a weekend
+        start = date_from - relativedelta(days=RATE_MAX_AGE_DAYS)
+        if date_to < start:
+            return None
+
+        base = company.currency_id.name
+        codes = currencies.mapped("name")
+        while start <= date_to:
+            end = min(start + relativedelta(days=RATE_HISTORY_CHUNK_DAYS - 1), date_to)
+            self._cashmind_store_rates(fetch_rate_series(base, codes, start, end))
+            start = end + relativedelta(days=1)
+        return date_to
+
+    @api.model
+    def _cron_load_rate_history(self):
+        """Loads the rates of every used currency since the oldest movement, so the movements are converted at
+        the rate of their own date. The month stats of the dashboards are recomputed if the last two months
+        were loaded."""
+        self.env.cr.execute("""
+            SELECT MIN(first_day) FROM (
+                SELECT MIN(date) AS first_day FROM cashmind_income
+                UNION ALL SELECT MIN(date) FROM cashmind_expense
+                UNION ALL SELECT MIN(date) FROM cashmind_save
+                UNION ALL SELECT MIN(transfer_date) FROM cashmind_transfer
+                UNION ALL SELECT MIN(transfer_date) FROM cashmind_transfer_external
+            ) AS first_days
+        """)
+        date_from = self.env.cr.fetchone()[0]
+        last_day = self._cashmind_load_rate_history(self._cashmind_get_used_currency_codes(), date_from)
+        if last_day and last_day >= get_last_month_range()[0]:
+            Dashboard = self.env["cashmind.dashboard"].sudo()
+            self.env.add_to_compute(Dashboard._fields["total_income_month"], Dashboard.search([]))
+        return True
+
+
+class ResCurrencyRate(models.Model):
+    _inherit = "res.currency.rate"
+
+    def init(self):
+        # Last rate of a currency on a date, looked up for every movement by _cashmind_rate_sql
+        create_index(self.env.cr, "res_currency_rate_cashmind_lookup_index", self._table,
+                     ["currency_id", "name DESC", "company_id"])
+
+    # Conversions are cached per company and date (res.currency._cashmind_get_rate_matrix)
+    @api.model_create_multi
+    def create(self, vals_list):
+        rates = super().create(vals_list)
+        self.env.registry.clear_cache("stable")
+        return rates
+
+    def write(self, vals):
+        rates = super().write(vals)
+        self.env.registry.clear_cache("stable")
+        return rates
+
+    def unlink(self):
+        rates = super().unlink()
+        self.env.registry.clear_cache("stable")
+        return rates
+
@@ -0,0 +1,17 @@
+from odoo import fields, models, api
+
+
+class ResUsers(models.Model):
+    _inherit = "res.users"
+
+    # Read by instrumentation.profiled: every CashMind operation of the user is profiled while it's set
+    cashmind_profiling = fields.Boolean(string="Perfilar operaciones de CashMind", groups="base.group_system",
+                                        help="Guarda un perfil (cProfile y consultas SQL) de cada operación de CashMind "
+                                             "del usuario como adjunto. Desactívelo al terminar el diagnóstico.")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        users = super().create(vals_list)
+        # Every user gets a dashboard, created in batch for all the new users
+        self.env["cashmind.dashboard"].sudo()._create_missing_dashboards(users.ids)
+        return users
@@ -2,11 +2,12 @@ from odoo import fields, models, api
 from odoo.exceptions import ValidationError
 from datetime import datetime
 from ..utils import update_balance, notification, clean_input
+from ..instrumentation import instrumented, profiled
 
 class Save(models.Model):
     _name = "cashmind.save"
 
-    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", unique=True,
+    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", unique=True, index=True,
                               default=lambda self: self.env.user)
     name = fields.Char(string="Nombre", required=True)
     source_account = fields.Many2one("cashmind.account", string="Cuenta de origen", required=True, domain="[('user_id', '=', uid)]")
@@ -21,7 +22,7 @@ class Save(models.Model):
                                               store=True, compute="_compute_destination_currency")
     available_destination = fields.Monetary(string="Balance actual", compute="_compute_destination_availability", 
                                             currency_field="destination_currency_id", readonly=True)
-    date = fields.Date(string="Fecha", default=datetime.today(), required=True)
+    date = fields.Date(string="Fecha", default=datetime.today(), required=True, index=True)
     note = fields.Text(string="Notas")
     active = fields.Boolean(string="Activo", default=True)
     goal_savinggoal_account = fields.Monetary(string="Objetivo", currency_field="destination_currency_id", compute="_get_goal", store=False)
@@ -59,6 +60,8 @@ class Save(models.Model):
         for rec in self:
             rec.destination_currency_id = rec.destination_savinggoal_account.currency_id
     
+    @profiled
+    @instrumented
     def create(self, vals):
         if isinstance(vals, list):
             vals = vals[0]
@@ -115,14 +118,17 @@ class Save(models.Model):
                      "Se actualizó correctamente el saldo de las cuentas asociadas a este ahorro.",
                     "success")
         
-        # Recalculate dashboard stats
-        user_id = save.user_id.id
-        dashboards = self.env['cashmind.dashboard'].search([('user_id', '=', user_id)])
-        dashboards.recalculate_dashboard()
+        # Recalculate dashboard stats (unless the caller does it once for many records)
+        if not self.env.context.get("defer_dashboard"):
+            user_id = save.user_id.id
+            dashboards = self.env['cashmind.dashboard'].search([('user_id', '=', user_id)])
+            dashboards.recalculate_dashboard()
 
         return save 
         
     
+    @profiled
+    @instrumented
     def write(self, vals):
        # Check if date is maximum today
         if "date" in vals and datetime.strptime(vals["date"], "%Y-%m-%d") > datetime.today():
@@ -261,6 +267,8 @@ class Save(models.Model):
 
         return save
 
+    @profiled
+    @instrumented
     def unlink(self):
         for rec in self:
             source_account_record = rec.source_account
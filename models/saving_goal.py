@@ -1,7 +1,12 @@
 from odoo import fields, models, api
 from odoo.exceptions import ValidationError
 from ..utils import notification, clean_input
+from ..instrumentation import instrumented, profiled
 from datetime import datetime
+from dateutil.relativedelta import relativedelta
+
+# Average length of a month in days, used by the projections
+DAYS_PER_MONTH = 365.25 / 12
 
 class SavingGoal(models.Model):
     _name = "cashmind.savinggoal" 
@@ -22,6 +27,11 @@ class SavingGoal(models.Model):
     percent_for_bar = fields.Html(string="Progreso visual", compute="_compute_percent_for_bar", sanitize=False, store=False)
     goal_completed = fields.Boolean(string="Completada", compute="_compute_goal_completed", store=True)
     save_ids = fields.One2many("cashmind.save", "destination_savinggoal_account", string="Ahorros")
+    monthly_average = fields.Monetary(string="Ahorro medio mensual", currency_field="currency_id",
+                                      compute="_compute_projection")
+    projected_date = fields.Date(string="Fecha estimada", compute="_compute_projection")
+    required_monthly = fields.Monetary(string="Ahorro mensual necesario", currency_field="currency_id",
+                                       compute="_compute_projection")
 
     @api.depends("amount", "balance")
     def _compute_goal_completed(self):
@@ -44,10 +54,38 @@ class SavingGoal(models.Model):
             </div>
             """
 
+    def _get_save_stats(self):
+        """{goal id: (total saved, date of the first save)} of the goals in self, with one grouped query."""
+        grouped = self.env["cashmind.save"].sudo()._read_group(
+            [("destination_savinggoal_account", "in", self._origin.ids)],
+            ["destination_savinggoal_account"], ["amount:sum", "date:min"])
+        return {goal.id: (total, first_date) for goal, total, first_date in grouped}
+
+    @api.depends("amount", "balance", "limit_date", "save_ids")
+    def _compute_projection(self):
+        today = fields.Date.context_today(self)
+        stats = self._get_save_stats()
+        for rec in self:
+            total, first_date = stats.get(rec._origin.id, (0.00, None))
+            remaining = max(rec.amount - rec.balance, 0.00)
+
+            # Pace of the saves since the first one (at least one month)
+            months_saving = max((today - first_date).days / DAYS_PER_MONTH, 1) if first_date else 0
+            rec.monthly_average = total / months_saving if months_saving else 0.00
+            if not remaining:
+                rec.projected_date = False
+            elif rec.monthly_average > 0:
+                rec.projected_date = today + relativedelta(days=round(remaining / rec.monthly_average * DAYS_PER_MONTH))
+            else:
+                rec.projected_date = False
+
+            # What's needed every month from now to reach the goal on limit_date (all of it if it's already due)
+            months_left = (rec.limit_date - today).days / DAYS_PER_MONTH if rec.limit_date else 0
+            rec.required_monthly = remaining / months_left if months_left >= 1 else remaining
+
     @api.model
     def _default_currency(self):
-        currency = self.env["res.currency"].search([("name", "=", "EUR")], limit=1)
-        return currency.id if currency else False
+        return self.env["res.currency"]._cashmind_currency_id("EUR")
 
     @api.depends("balance", "amount")
     def _calculate_percent_reached(self):
@@ -57,6 +95,8 @@ class SavingGoal(models.Model):
             else:
                 rec.reached_percent = rec.balance / rec.amount * 100
 
+    @profiled
+    @instrumented
     def create(self, vals):
         if isinstance(vals, list):
             vals = vals[0]
@@ -98,6 +138,8 @@ class SavingGoal(models.Model):
 
         return savinggoal
     
+    @profiled
+    @instrumented
     def write(self, vals):
         for rec in self:
             # Cleaning the name and description
@@ -161,6 +203,8 @@ class SavingGoal(models.Model):
 
         return saving_goal
 
+    @profiled
+    @instrumented
     def unlink(self):
         for rec in self:
             # Check if there are other models pointing to this one
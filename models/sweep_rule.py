@@ -0,0 +1,205 @@
+from odoo import fields, models, api
+from odoo.exceptions import ValidationError, UserError
+from collections import defaultdict
+from dateutil.relativedelta import relativedelta
+from ..utils import clean_input
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class SweepRule(models.Model):
+    _name = "cashmind.sweep_rule"
+    _order = "sequence, id"
+
+    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", index=True,
+                              default=lambda self: self.env.user)
+    name = fields.Char(string="Regla", required=True)
+    sequence = fields.Integer(string="Prioridad", default=10)
+    rule_type = fields.Selection([
+        ("income_percent", "Porcentaje de cada ingreso"),
+        ("round_up", "Redondeo de gastos"),
+        ("balance_above", "Saldo por encima de un límite a fin de mes"),
+        ], string="Tipo de regla", required=True, default="income_percent")
+    account = fields.Many2one("cashmind.account", string="Cuenta de origen", required=True, ondelete="cascade",
+                              domain="[('user_id', '=', uid)]")
+    savinggoal = fields.Many2one("cashmind.savinggoal", string="Meta de ahorro", required=True, ondelete="cascade",
+                                 domain="[('user_id', '=', uid)]")
+    currency_id = fields.Many2one(related="account.currency_id", string="Moneda")
+    percent = fields.Float(string="Porcentaje (%)", default=10.0)
+    round_to = fields.Float(string="Redondear a", default=1.0)
+    threshold = fields.Monetary(string="Saldo a conservar", currency_field="currency_id")
+    # Last income (income_percent) or expense (round_up) already swept: movements are never swept twice
+    last_movement_id = fields.Integer(string="Último movimiento procesado", readonly=True, copy=False)
+    # Part of the swept movements that didn't fit in the balance of the account: carried into the next run
+    pending_amount = fields.Monetary(string="Pendiente de ahorrar", currency_field="currency_id", readonly=True,
+                                     copy=False)
+    # Last run (balance_above: last day of the last month swept)
+    last_run_date = fields.Date(string="Última ejecución", readonly=True, copy=False)
+    active = fields.Boolean(string="Mostrar", default=True)
+
+    @api.constrains("rule_type", "percent", "round_to", "threshold", "account", "savinggoal")
+    def _check_rule(self):
+        for rec in self:
+            if rec.account.currency_id != rec.savinggoal.currency_id:
+                raise ValidationError("El tipo de moneda de la cuenta de origen y de la meta de ahorro no pueden ser diferentes.")
+            if rec.rule_type == "income_percent" and not 0 < rec.percent <= 100:
+                raise ValidationError("El porcentaje debe ser mayor que 0 y como máximo 100.")
+            if rec.rule_type == "round_up" and rec.round_to <= 0:
+                raise ValidationError("La cantidad a la que se redondea debe ser mayor que 0.")
+            if rec.rule_type == "balance_above" and rec.threshold < 0:
+                raise ValidationError("El saldo a conservar no puede ser negativo.")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Only the movements posted after the rule is created are swept
+        last_ids = {}
+        for table in ("cashmind_income", "cashmind_expense"):
+            self.env.cr.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+            last_ids[table] = self.env.cr.fetchone()[0]
+        for vals in vals_list:
+            if vals.get("name"):
+                vals["name"] = clean_input(vals["name"], "title").lower().capitalize()
+            table = "cashmind_expense" if vals.get("rule_type") == "round_up" else "cashmind_income"
+            vals["last_movement_id"] = last_ids[table]
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if vals.get("name"):
+            vals["name"] = clean_input(vals["name"], "title").lower().capitalize()
+        return super().write(vals)
+
+    def _get_movement_sweeps(self):
+        """{rule id: (amount to sweep, last movement id)} of the income_percent and round_up rules, one query each."""
+        sweeps = {}
+        queries = {
+            "income_percent": """
+                SELECT r.id, SUM(i.amount) * r.percent / 100, MAX(i.id)
+                FROM cashmind_sweep_rule r
+                JOIN cashmind_income i ON i.account = r.account AND i.id > r.last_movement_id AND i.active
+                WHERE r.id = ANY(%s)
+                GROUP BY r.id, r.percent
+            """,
+            "round_up": """
+                SELECT r.id, SUM(CEIL(e.amount / r.round_to) * r.round_to - e.amount), MAX(e.id)
+                FROM cashmind_sweep_rule r
+                JOIN cashmind_expense e ON e.account = r.account AND e.id > r.last_movement_id AND e.active
+                WHERE r.id = ANY(%s)
+                GROUP BY r.id, r.round_to
+            """,
+        }
+        for rule_type, query in queries.items():
+            rules = self.filtered(lambda r: r.rule_type == rule_type)
+            if rules:
+                self.env.cr.execute(query, (rules.ids,))
+                sweeps.update({rule_id: (float(amount or 0.00), last_id)
+                               for rule_id, amount, last_id in self.env.cr.fetchall()})
+        return sweeps
+
+    def _run_sweeps(self, today):
+        """Runs these rules and creates one cashmind.save per (account, goal) with the net amount of all of them.
+
+        Each pair is saved in its own savepoint together with the progress of its rules, so a failed pair (e.g.
+        not enough balance) is retried on the next run without sweeping anything twice. Returns the set of users
+        with new saves.
+        """
+        self.env.flush_all()
+        movement_sweeps = self._get_movement_sweeps()
+        # balance_above sweeps a month once it has ended (on its last day): the last one, or the previous one if
+        # that run was missed, so a month is never lost because the cron didn't run on its last day
+        month_start = today.replace(day=1)
+        period_end = today if today + relativedelta(day=31) == today else month_start - relativedelta(days=1)
+
+        pairs = defaultdict(lambda: self.browse())
+        for rule in self:
+            pairs[(rule.account, rule.savinggoal)] |= rule
+
+        users = set()
+        for (account, savinggoal), rules in pairs.items():
+            amount = 0.00
+            updates = []
+            for rule in rules:
+                if rule.rule_type == "balance_above":
+                    already_run = rule.last_run_date and rule.last_run_date >= period_end.replace(day=1)
+                    if already_run or rule.create_date.date() > period_end:
+                        continue
+                    # Whatever is above the threshold, after the other sweeps of this account
+                    swept = max(account.balance - amount - rule.threshold, 0.00)
+                    # The month swept, so a catch-up run doesn't skip the sweep at the end of the current month
+                    updates.append((rule, {"last_run_date": period_end}))
+                else:
+                    new_amount, last_id = movement_sweeps.get(rule.id, (0.00, None))
+                    due = rule.pending_amount + new_amount
+                    # Capped by what is left in the account: the rest is kept as pending for the next run, so the
+                    # watermark can move past these movements without losing any part of their sweep
+                    swept = min(due, max(account.balance - amount, 0.00))
+                    pending = round(due - swept, 2)
+                    if last_id or pending != rule.pending_amount:
+                        updates.append((rule, {"last_movement_id": last_id or rule.last_movement_id,
+                                               "pending_amount": pending, "last_run_date": today}))
+                amount += swept
+            amount = round(amount, 2)
+            if not updates:
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    if amount > 0:
+                        self.env["cashmind.save"].with_user(account.user_id).with_context(defer_dashboard=True).create({
+                            "user_id": account.user_id.id,
+                            "name": self._prepare_save_name(account, savinggoal, today,
+                                                            [rule for rule, _ in updates]),
+                            "source_account": account.id,
+                            "destination_savinggoal_account": savinggoal.id,
+                            "amount": amount,
+                            "date": fields.Date.to_string(today),
+                            "note": "Generado por las reglas de ahorro automático",
+                        })
+                        users.add(account.user_id.id)
+                    for rule, vals in updates:
+                        rule.write(vals)
+            except (ValidationError, UserError) as e:
+                _logger.warning("Sweep from account %s to goal %s failed: %s", account.id, savinggoal.id, e)
+        return users
+
+    @api.model
+    def _prepare_save_name(self, account, savinggoal, today, rules):
+        """Unique name (saves names are unique per user) of an automatic save: the pair, the day and the rule types,
+        plus a number if the rules already ran that day (e.g. a manual run after the cron)."""
+        rule_types = " ".join(sorted({rule.rule_type for rule in rules}))
+        name = f"ahorro automatico {account.name} {savinggoal.name} {today} {rule_types}".lower()
+        self.env.cr.execute("""
+            SELECT lower(name) FROM cashmind_save WHERE user_id = %s AND lower(name) LIKE %s
+        """, (account.user_id.id, name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"))
+        used_names = {row[0] for row in self.env.cr.fetchall()}
+        candidate = name
+        counter = 2
+        while candidate in used_names:
+            candidate = f"{name} {counter}"
+            counter += 1
+        return candidate
+
+    @api.model
+    def _cron_run_sweeps(self, batch_size=500, auto_commit=True):
+        """Runs every active sweep rule, batch_size rules at a time (rules of the same account in the same batch)."""
+        today = fields.Date.context_today(self)
+        Rules = self.sudo()
+        last_account_id = 0
+        while True:
+            # Batches are cut by account, so all the rules of an account are netted together
+            self.env.cr.execute("""
+                SELECT DISTINCT account FROM cashmind_sweep_rule
+                WHERE active AND account > %s ORDER BY account LIMIT %s
+            """, (last_account_id, batch_size))
+            account_ids = [row[0] for row in self.env.cr.fetchall()]
+            if not account_ids:
+                break
+            last_account_id = account_ids[-1]
+            rules = Rules.search([("account", "in", account_ids)])
+            users = rules._run_sweeps(today)
+
+            # Recalculate dashboard stats, once per user for the whole batch
+            dashboards = self.env["cashmind.dashboard"].sudo().search([("user_id", "in", list(users))])
+            dashboards.recalculate_dashboard()
+            if auto_commit:
+                self.env.cr.commit()
+        return True
@@ -2,11 +2,12 @@ from odoo import fields, models, api
 from odoo.exceptions import ValidationError
 from datetime import datetime
 from ..utils import notification, update_balance, clean_input
+from ..instrumentation import instrumented, profiled
 
 class Transfer(models.Model):
     _name = "cashmind.transfer"
 
-    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", unique=True,
+    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", unique=True, index=True,
                               default=lambda self: self.env.user)
     name = fields.Char(string="Nombre", required=True)
     source_account = fields.Many2one("cashmind.account", string="Cuenta de origen", required=True, domain="[('user_id', '=', uid)]")
@@ -21,15 +22,14 @@ class Transfer(models.Model):
     available_destination_balance = fields.Monetary(string="Balance", currency_field="destination_currency_id", readonly=True,
                                                     compute="_compute_destination_availability")
     amount = fields.Monetary(string="Cantidad", currency_field="source_currency_id", required=True)
-    transfer_date = fields.Date(string="Fecha", default=lambda self: fields.Date.context_today(self), 
+    transfer_date = fields.Date(string="Fecha", default=lambda self: fields.Date.context_today(self), index=True,
                                 required=True)
     active = fields.Boolean(string="Mostrar", default=True)
     note = fields.Text(string="Notas")
 
     @api.model
     def _default_currency(self):
-        currency = self.env["res.currency"].search([("name", "=", "EUR")], limit=1)
-        return currency.id if currency else False
+        return self.env["res.currency"]._cashmind_currency_id("EUR")
     
     @api.onchange("source_account")
     def _compute_source_availability(self):
@@ -58,6 +58,8 @@ class Transfer(models.Model):
                 notification(rec, "Error de cuenta", "La cuenta de destino y de origen no pueden ser la misma.",
                              "warning")
         
+    @profiled
+    @instrumented
     def create(self, vals):
         if isinstance(vals, list):
             vals = vals[0]
@@ -120,13 +122,16 @@ class Transfer(models.Model):
                         "Se actualizó correctamente el saldo de las cuentas asociadas a esta transferencia.",
                         "success")
         
-        # Recalculate dashboard stats
-        user_id = transfer.user_id.id
-        dashboards = self.env['cashmind.dashboard'].search([('user_id', '=', user_id)])
-        dashboards.recalculate_dashboard()
+        # Recalculate dashboard stats (unless the caller does it once for many records)
+        if not self.env.context.get("defer_dashboard"):
+            user_id = transfer.user_id.id
+            dashboards = self.env['cashmind.dashboard'].search([('user_id', '=', user_id)])
+            dashboards.recalculate_dashboard()
 
         return transfer
     
+    @profiled
+    @instrumented
     def write(self, vals):
         # Check if date is maximum today
         if "transer_date" in vals and datetime.strptime(vals["transfer_date"], "%Y-%m-%d") > datetime.today():
@@ -266,6 +271,8 @@ class Transfer(models.Model):
         
         return transfer
 
+    @profiled
+    @instrumented
     def unlink(self):
         for rec in self:
             source_account_record = rec.source_account
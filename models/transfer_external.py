@@ -2,12 +2,13 @@ from odoo import fields, models, api
 from odoo.exceptions import ValidationError
 from datetime import datetime
 from ..utils import notification, update_balance, clean_input
+from ..instrumentation import instrumented, profiled
 
 class Transfer_external(models.Model):
     _name = "cashmind.transfer_external"
 
-    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", default=lambda self: self.env.user)
-    external_user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", 
+    user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", index=True, default=lambda self: self.env.user)
+    external_user_id = fields.Many2one("res.users", string="Usuario", required=True, ondelete="cascade", index=True, 
                                         domain="[('id', '!=', uid)]")
     name = fields.Char(string="Nombre", required=True)
     source_account = fields.Many2one("cashmind.account", string="Cuenta de origen", required=True, domain="[('user_id', '=', uid)]")
@@ -21,15 +22,14 @@ class Transfer_external(models.Model):
     destination_currency_id = fields.Many2one("res.currency", string="Moneda", readonly=True, 
                                               store=True, compute="_compute_destination_currency")
     amount = fields.Monetary(string="Cantidad", currency_field="source_currency_id", required=True)
-    transfer_date = fields.Date(string="Fecha", default=lambda self: fields.Date.context_today(self), 
+    transfer_date = fields.Date(string="Fecha", default=lambda self: fields.Date.context_today(self), index=True,
                                 required=True)
     active = fields.Boolean(string="Mostrar", default=True)
     note = fields.Text(string="Notas")
 
     @api.model
     def _default_currency(self):
-        currency = self.env["res.currency"].search([("name", "=", "EUR")], limit=1)
-        return currency.id if currency else False
+        return self.env["res.currency"]._cashmind_currency_id("EUR")
     
     @api.onchange("source_account")
     def _compute_source_availability(self):
@@ -53,6 +53,8 @@ class Transfer_external(models.Model):
                 notification(rec, "Error de cuenta", "La cuenta de destino y de origen no pueden ser la misma.",
                              "warning")
         
+    @profiled
+    @instrumented
     def create(self, vals):
         if isinstance(vals, list):
             vals = vals[0]
@@ -123,6 +125,8 @@ class Transfer_external(models.Model):
 
         return transfer
     
+    @profiled
+    @instrumented
     def write(self, vals):
         # Check if date is maximum today
         if "transer_date" in vals and datetime.strptime(vals["transfer_date"], "%Y-%m-%d") > datetime.today():
@@ -201,6 +205,8 @@ class Transfer_external(models.Model):
         
         return transfer
 
+    @profiled
+    @instrumented
     def unlink(self):
         for rec in self:
             raise ValidationError("No puede eliminar una transferencia hecha a un usuario externo. Si prefiere, puede archivarla.")         
@@ -0,0 +1,245 @@
+/** @odoo-module **/
+
+import { Component, onMounted, onWillStart, onWillUnmount, onWillUpdateProps, useRef, useState } from "@odoo/owl";
+import { deserializeDate, formatDate } from "@web/core/l10n/dates";
+import { registry } from "@web/core/registry";
+import { useService } from "@web/core/utils/hooks";
+import { formatFloat } from "@web/views/fields/formatters";
+import { standardWidgetProps } from "@web/views/widgets/standard_widget_props";
+
+/**
+ * Loads the dashboard cards on demand through cashmind.dashboard.get_dashboard_cards() and keeps them
+ * in memory until the dashboard stats change (the server "version" is different). Before serving cached
+ * cards, the summary card (the cheapest one) is fetched again to compare the version.
+ */
+export const cashmindDashboardService = {
+    dependencies: ["orm"],
+    start(env, { orm }) {
+        let version = null;
+        let status = {};
+        let checking = null;
+        const cache = new Map();
+        // Load in flight of every card not cached yet, shared by every widget asking for it
+        const pending = new Map();
+
+        async function load(cards, breakdown) {
+            const data = await orm.call("cashmind.dashboard", "get_dashboard_cards", [cards, breakdown]);
+            if (data.version !== version) {
+                cache.clear();
+                version = data.version;
+            }
+            status = {
+                currency: data.currency,
+                rates_pending: data.rates_pending,
+                rates_stale: data.rates_stale,
+                rates_date: data.rates_date,
+            };
+            for (const card of cards) {
+                cache.set(`${card}:${breakdown}`, data[card]);
+            }
+            return data;
+        }
+
+        function checkVersion() {
+            // Shared by every card asking at the same time: one summary fetch per check
+            if (!checking) {
+                checking = load(["summary"], false).finally(() => {
+                    checking = null;
+                });
+            }
+            return checking;
+        }
+
+        async function getCards(cards, breakdown = false) {
+            if (cache.size) {
+                await checkVersion();
+            }
+            // Retried once if the stats change between the version check and the load of the missing cards
+            for (let attempt = 0; attempt < 2; attempt++) {
+                const waiting = [];
+                const missing = [];
+                for (const card of cards) {
+                    const key = `${card}:${breakdown}`;
+                    if (cache.has(key)) {
+                        continue;
+                    }
+                    // A card already being loaded (e.g. by another widget of the same dashboard) is not asked twice
+                    if (pending.has(key)) {
+                        waiting.push(pending.get(key));
+                    } else {
+                        missing.push(card);
+                    }
+                }
+                if (!waiting.length && !missing.length) {
+                    break;
+                }
+                if (missing.length) {
+                    const keys = missing.map((card) => `${card}:${breakdown}`);
+                    const promise = load(missing, breakdown).finally(() => {
+                        for (const key of keys) {
+                            pending.delete(key);
+                        }
+                    });
+                    for (const key of keys) {
+                        pending.set(key, promise);
+                    }
+                    waiting.push(promise);
+                }
+                await Promise.all(waiting);
+            }
+            return Object.fromEntries(cards.map((card) => [card, cache.get(`${card}:${breakdown}`)]));
+        }
+
+        return {
+            getCards,
+            async getCard(card, breakdown = false) {
+                return (await getCards([card], breakdown))[card];
+            },
+            getStatus() {
+                return status;
+            },
+            invalidate() {
+                cache.clear();
+                version = null;
+            },
+        };
+    },
+};
+
+registry.category("services").add("cashmind_dashboard", cashmindDashboardService);
+
+/**
+ * "Ver detalle" link of a dashboard card. The JSON breakdown of the card is only requested when it is opened.
+ */
+export class CashmindCardBreakdown extends Component {
+    static template = "cashmind.CardBreakdown";
+    static props = {
+        ...standardWidgetProps,
+        card: String,
+    };
+
+    setup() {
+        this.dashboard = useService("cashmind_dashboard");
+        this.state = useState({ open: false, lines: null });
+    }
+
+    async toggle() {
+        this.state.open = !this.state.open;
+        if (this.state.open) {
+            // Served from the service cache unless the stats changed since it was loaded
+            const data = await this.dashboard.getCard(this.props.card, true);
+            this.state.lines = data.breakdown || [];
+        }
+    }
+}
+
+registry.category("view_widgets").add("cashmind_card_breakdown", {
+    component: CashmindCardBreakdown,
+    extractProps: ({ attrs }) => ({ card: attrs.card }),
+});
+
+/**
+ * Total amount of the dashboard banner: the summary card, the first paint of the dashboard. It's checked again
+ * every time the record is updated (e.g. new currency).
+ */
+export class CashmindDashboardTotal extends Component {
+    static template = "cashmind.DashboardTotal";
+    static props = { ...standardWidgetProps };
+
+    setup() {
+        this.dashboard = useService("cashmind_dashboard");
+        this.state = useState({ cards: null, status: {} });
+        onWillStart(() => this.load());
+        onWillUpdateProps(() => this.load());
+    }
+
+    get cardNames() {
+        return ["summary"];
+    }
+
+    async load() {
+        const cards = await this.dashboard.getCards(this.cardNames);
+        // Merged: a section that became visible meanwhile may have been loaded by a later call
+        this.state.cards = { ...this.state.cards, ...cards };
+        this.state.status = this.dashboard.getStatus();
+    }
+
+    get cards() {
+        return this.state.cards;
+    }
+
+    get status() {
+        return this.state.status;
+    }
+}
+
+registry.category("view_widgets").add("cashmind_dashboard_total", {
+    component: CashmindDashboardTotal,
+});
+
+/**
+ * Cards and stats of the dashboard. They are not fields of the kanban view: the summary is rendered first (shared
+ * with the banner total) and every other section loads its cards through the cashmind_dashboard service when it
+ * becomes visible.
+ */
+export class CashmindDashboardCards extends CashmindDashboardTotal {
+    static template = "cashmind.DashboardCards";
+    static components = { CashmindCardBreakdown };
+    // t-ref of the section: cards it shows
+    static sections = {
+        monthly: ["expense", "income", "save", "transfer"],
+        external: ["transfer_external"],
+    };
+
+    setup() {
+        super.setup();
+        this.visibleSections = new Set();
+        this.sectionRefs = Object.fromEntries(
+            Object.keys(this.constructor.sections).map((section) => [section, useRef(section)])
+        );
+        onMounted(() => {
+            this.observer = new IntersectionObserver((entries) => this.onSectionsVisible(entries));
+            for (const ref of Object.values(this.sectionRefs)) {
+                if (ref.el) {
+                    this.observer.observe(ref.el);
+                }
+            }
+        });
+        onWillUnmount(() => this.observer && this.observer.disconnect());
+    }
+
+    get cardNames() {
+        const names = ["summary"];
+        for (const section of this.visibleSections) {
+            names.push(...this.constructor.sections[section]);
+        }
+        return names;
+    }
+
+    onSectionsVisible(entries) {
+        let added = false;
+        for (const entry of entries) {
+            const section = entry.isIntersecting && entry.target.getAttribute("data-section");
+            if (section && !this.visibleSections.has(section)) {
+                this.visibleSections.add(section);
+                this.observer.unobserve(entry.target);
+                added = true;
+            }
+        }
+        if (added) {
+            this.load();
+        }
+    }
+
+    get ratesDate() {
+        return this.status.rates_date ? formatDate(deserializeDate(this.status.rates_date)) : "";
+    }
+
+    formatFloat(value) {
+        return formatFloat(value || 0, { digits: [false, 2] });
+    }
+}
+
+registry.category("view_widgets").add("cashmind_dashboard_cards", {
+    component: CashmindDashboardCards,
+});
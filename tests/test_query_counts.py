@@ -0,0 +1,189 @@
+from datetime import date, timedelta
+from odoo.tests import TransactionCase, tagged
+
+# SQL queries of every operation, including the recalculation of the dashboard it triggers. They are upper bounds
+# that fail the test as soon as an operation does more queries: update them (with the reason in the commit) when
+# a change really needs more, and lower them when it needs less. This is the only table of query counts:
+# benchmarks/bench_cashmind.py --check uses it too.
+QUERY_COUNTS = {
+    "account_create": 38,
+    "account_write": 30,
+    "account_unlink": 34,
+    "category_create": 32,
+    "category_write": 30,
+    "category_unlink": 32,
+    "expense_create": 44,
+    "expense_write": 36,
+    "expense_unlink": 38,
+    "income_create": 42,
+    "income_write": 34,
+    "income_unlink": 36,
+    "transfer_create": 44,
+    "transfer_write": 34,
+    "transfer_unlink": 40,
+    "transfer_external_create": 62,
+    "transfer_external_write": 56,
+    "save_create": 46,
+    "save_write": 34,
+    "save_unlink": 40,
+    "budget_create": 44,
+    "budget_write": 36,
+    "budget_unlink": 40,
+    "savinggoal_create": 36,
+    "savinggoal_write": 30,
+    "savinggoal_unlink": 32,
+    # Bulk operations on BULK_SIZE records. The tests also check that they don't do more queries than the same
+    # operation on SMALL_BULK_SIZE records
+    "income_write_bulk": 40,
+    "income_unlink_bulk": 44,
+    "expense_unlink_bulk": 46,
+    # Opening the dashboard: the kanban read of the web client and the cards loaded by its widgets
+    "dashboard_kanban_read": 20,
+}
+BULK_SIZE = 100
+SMALL_BULK_SIZE = 2
+
+
+@tagged("post_install", "-at_install")
+class TestQueryCounts(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Currency = cls.env["res.currency"].with_context(active_test=False)
+        cls.eur = Currency.search([("name", "=", "EUR")], limit=1)
+        cls.usd = Currency.search([("name", "=", "USD")], limit=1)
+        (cls.eur | cls.usd).write({"active": True})
+        # Conversions only read the stored rates
+        cls.env["res.currency"]._cashmind_store_rates({date.today(): {"EUR": 1.0, "USD": 1.08}})
+
+        group_ids = [cls.env.ref("base.group_user").id, cls.env.ref("cashmind.group_cashmind_user").id]
+        Users = cls.env["res.users"].with_context(no_reset_password=True)
+        cls.user = Users.create({"name": "Query user", "login": "cashmind_query_user",
+                                 "groups_id": [(6, 0, group_ids)]})
+        cls.other_user = Users.create({"name": "Query other user", "login": "cashmind_query_other_user",
+                                       "groups_id": [(6, 0, group_ids)]})
+        cls.uenv = cls.env(user=cls.user)
+
+        Account = cls.uenv["cashmind.account"]
+        cls.account = Account.create({"name": "Cuenta eur", "currency_id": cls.eur.id, "balance": 10 ** 6})
+        cls.usd_account = Account.create({"name": "Cuenta usd", "currency_id": cls.usd.id, "balance": 10 ** 6})
+        cls.other_account = cls.env(user=cls.other_user)["cashmind.account"].create({
+            "name": "Cuenta otro", "currency_id": cls.eur.id, "balance": 0.0,
+        })
+        cls.expense_category = cls.uenv["cashmind.category"].create({"name": "Compras", "category_type": "expense"})
+        cls.income_category = cls.uenv["cashmind.category"].create({"name": "Nomina", "category_type": "income"})
+        today = date.today()
+        cls.goal = cls.uenv["cashmind.savinggoal"].create({
+            "name": "Meta", "currency_id": cls.eur.id, "amount": 10 ** 6,
+            "start_date": (today - timedelta(days=30)).strftime("%Y-%m-%d"),
+            "limit_date": (today + timedelta(days=365)).strftime("%Y-%m-%d"),
+        })
+
+    def _vals(self, model, name):
+        today = date.today().strftime("%Y-%m-%d")
+        tomorrow = (date.today() + timedelta(days=1)).strftime("%Y-%m-%d")
+        return {
+            "account": {"name": name, "currency_id": self.eur.id, "balance": 100.0},
+            "category": {"name": name, "category_type": "expense"},
+            "expense": {"name": name, "account": self.account.id, "category": self.expense_category.id,
+                        "amount": 1.0, "date": today},
+            "income": {"name": name, "account": self.account.id, "category": self.income_category.id,
+                       "amount": 1.0, "date": today},
+            "transfer": {"name": name, "source_account": self.account.id, "destination_account": self.usd_account.id,
+                         "amount": 1.0, "transfer_date": today},
+            "transfer_external": {"name": name, "external_user_id": self.other_user.id,
+                                  "source_account": self.account.id, "destination_account": self.other_account.id,
+                                  "amount": 1.0, "transfer_date": today},
+            "save": {"name": name, "source_account": self.account.id,
+                     "destination_savinggoal_account": self.goal.id, "amount": 1.0, "date": today},
+            "budget": {"name": name, "account": self.account.id, "category": self.expense_category.id,
+                       "amount": 1.0, "start_date": today, "end_date": tomorrow},
+            "savinggoal": {"name": name, "currency_id": self.eur.id, "amount": 1000.0,
+                           "start_date": today, "limit_date": tomorrow},
+        }[model]
+
+    def _check_model(self, model, unlink=True):
+        Model = self.uenv[f"cashmind.{model}"]
+        write_vals = {"description": "Query"} if model == "category" else {"note": "Query"}
+        # First run out of the count: caches (currency map, rate matrix, rule matchers) and prefetching
+        warmup = Model.create(self._vals(model, "Calentamiento"))
+        warmup.write(write_vals)
+        self.env.flush_all()
+
+        with self.assertQueryCount(QUERY_COUNTS[f"{model}_create"]):
+            record = Model.create(self._vals(model, "Consulta"))
+        with self.assertQueryCount(QUERY_COUNTS[f"{model}_write"]):
+            record.write(write_vals)
+        if unlink:
+            with self.assertQueryCount(QUERY_COUNTS[f"{model}_unlink"]):
+                record.unlink()
+
+    def test_account(self):
+        self._check_model("account")
+
+    def test_category(self):
+        self._check_model("category")
+
+    def test_expense(self):
+        self._check_model("expense")
+
+    def test_income(self):
+        self._check_model("income")
+
+    def test_transfer(self):
+        self._check_model("transfer")
+
+    def test_transfer_external(self):
+        # External transfers can't be deleted (only archived)
+        self._check_model("transfer_external", unlink=False)
+
+    def test_save(self):
+        self._check_model("save")
+
+    def test_budget(self):
+        self._check_model("budget")
+
+    def test_savinggoal(self):
+        self._check_model("savinggoal")
+
+    def test_dashboard_read(self):
+        Dashboard = self.uenv["cashmind.dashboard"]
+        view = Dashboard.get_views([(False, "kanban")])
+        fields = view["models"]["cashmind.dashboard"]
+        fields = fields.get("fields", fields)
+        with self.assertQueryCount(QUERY_COUNTS["dashboard_kanban_read"]):
+            Dashboard.web_search_read([("user_id", "=", self.user.id)], {name: {} for name in fields})
+            Dashboard.get_dashboard_cards(["summary", "expense", "income", "save", "transfer", "transfer_external"],
+                                          False)
+
+    def _create_bulk(self, model, size, name):
+        vals = self._vals(model, name)
+        records = self.uenv[f"cashmind.{model}"]._create_batch([
+            dict(vals, user_id=self.user.id, name=f"{name} {n}") for n in range(size)])
+        self.env.flush_all()
+        return records
+
+    def _count_queries(self, operation):
+        start = self.env.cr.sql_log_count
+        operation()
+        self.env.flush_all()
+        return self.env.cr.sql_log_count - start
+
+    def _check_bulk(self, model, operation, scenario):
+        """Queries of operation on BULK_SIZE records: within QUERY_COUNTS, and not more than on a few records."""
+        small = self._create_bulk(model, SMALL_BULK_SIZE, "Pocos")
+        small_count = self._count_queries(lambda: operation(small))
+        bulk = self._create_bulk(model, BULK_SIZE, "Masivo")
+        with self.assertQueryCount(QUERY_COUNTS[scenario]):
+            bulk_count = self._count_queries(lambda: operation(bulk))
+        self.assertLessEqual(bulk_count, small_count,
+                             f"{scenario}: {bulk_count} queries for {BULK_SIZE} records, "
+                             f"{small_count} for {SMALL_BULK_SIZE}")
+
+    def test_income_bulk(self):
+        self._check_bulk("income", lambda incomes: incomes.write({"note": "Query"}), "income_write_bulk")
+        self._check_bulk("income", lambda incomes: incomes.unlink(), "income_unlink_bulk")
+
+    def test_expense_bulk(self):
+        self._check_bulk("expense", lambda expenses: expenses.unlink(), "expense_unlink_bulk")
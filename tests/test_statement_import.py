@@ -0,0 +1,51 @@
+import base64
+from datetime import date
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestStatementImport(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.eur = cls.env["res.currency"].with_context(active_test=False).search([("name", "=", "EUR")], limit=1)
+        cls.eur.active = True
+        group_ids = [cls.env.ref("base.group_user").id, cls.env.ref("cashmind.group_cashmind_user").id]
+        cls.user = cls.env["res.users"].with_context(no_reset_password=True).create({
+            "name": "Import user", "login": "cashmind_import_user", "groups_id": [(6, 0, group_ids)],
+        })
+        cls.uenv = cls.env(user=cls.user)
+        cls.account = cls.uenv["cashmind.account"].create({"name": "Cuenta", "currency_id": cls.eur.id,
+                                                           "balance": 1000.0})
+        cls.expense_category = cls.uenv["cashmind.category"].create({"name": "Compras", "category_type": "expense"})
+        cls.income_category = cls.uenv["cashmind.category"].create({"name": "Nomina", "category_type": "income"})
+        cls.dashboard = cls.uenv["cashmind.dashboard"].search([("user_id", "=", cls.user.id)], limit=1)
+        cls.dashboard.currency_id = cls.eur
+
+    def _import(self, lines):
+        content = "fecha;concepto;importe\n" + "\n".join(lines)
+        wizard = self.uenv["cashmind.statement_import"].create({
+            "file": base64.b64encode(content.encode()),
+            "filename": "extracto.csv",
+            "file_format": "csv",
+            "account": self.account.id,
+            "expense_category": self.expense_category.id,
+            "income_category": self.income_category.id,
+            "use_category_rules": False,
+        })
+        wizard.action_import()
+        return wizard
+
+    def test_balanced_statement_updates_month_stats(self):
+        """Income equal to expenses: the balance doesn't change, but the month stats must."""
+        today = date.today().strftime("%d/%m/%Y")
+        self.assertEqual(self.dashboard.total_income_month, 0.0)
+        self.assertEqual(self.dashboard.total_expense_month, 0.0)
+
+        wizard = self._import([f"{today};Nomina octubre;250,00", f"{today};Alquiler piso;-250,00"])
+
+        self.assertEqual((wizard.imported_income_count, wizard.imported_expense_count), (1, 1))
+        self.assertEqual(self.account.balance, 1000.0)
+        self.assertEqual(self.dashboard.total_income_month, 250.0)
+        self.assertEqual(self.dashboard.total_expense_month, 250.0)
@@ -1,6 +1,14 @@
 from odoo.exceptions import ValidationError, UserError
 from datetime import date, datetime, timedelta
 import requests
+import hashlib
+import unicodedata
+import numpy as np
+from .instrumentation import instrumented, count_http_call
+
+RATE_API_URL = "https://api.frankfurter.dev/v1"
+# Seconds to wait for the exchange rate API. Only crons call it, never a save
+RATE_API_TIMEOUT = 10
 
 def notification(self, title, body, message_type, sticky=False):
     self.env["bus.bus"]._sendone(
@@ -15,6 +23,7 @@ def notification(self, title, body, message_type, sticky=False):
     ) 
 
 
+@instrumented
 def update_balance(account_record, amount, balance_field_name="balance"):
     """Amount could be positive or negative, depending if you want to add or substract."""
     if account_record and account_record.id:
@@ -30,6 +39,8 @@ def update_balance(account_record, amount, balance_field_name="balance"):
             account_record.with_context(allow_balance_update=True, deny_notification=True).write({
                 "expended": account_record.expended + amount
             })
+            # Budget alerts (80%, 100%...), sent once per user at commit time
+            account_record._check_alert_thresholds()
         
         return True
         
@@ -119,14 +130,119 @@ def get_last_month_range(full_date=None):
 
     return last_month_range
 
-def convert_currencies(from_currency, to_currency, amount):
-    URL = f"https://api.frankfurter.dev/v1/latest?base={from_currency}&symbols={to_currency}"
-    
+def normalize_description(text):
+    """Description used to detect duplicated movements: lowercase, without accents, signs or repeated spaces."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return " ".join("".join(c if c.isalnum() else " " for c in text).split())
+
+def movement_fingerprint(account_id, movement_date, amount, description, occurrence=1):
+    """Hash that identifies an imported movement: account, date, amount, normalized description and the number
+    of identical movements before this one in the same statement."""
+    key = f"{account_id}|{movement_date}|{float(amount):.2f}|{normalize_description(description)}|{occurrence}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def set_movement_fingerprint(model, vals, sign=1):
+    """Sets the fingerprint of a movement created through create() (forms, API, recurring), the same one the
+    importer gives to the first identical row of a statement (sign is -1 for expenses, negative in statements).
+
+    If the user already has a movement with it, the new one is flagged as possible duplicate instead (the
+    fingerprint is unique per user). Movements without an account (expenses of a budget) get no fingerprint.
+    """
+    if "fingerprint" in vals or not vals.get("account") or not vals.get("amount"):
+        return vals
+    fingerprint = movement_fingerprint(vals["account"], vals.get("date") or date.today(), sign * vals["amount"],
+                                       vals.get("name"))
+    if model._get_existing_fingerprints([fingerprint]):
+        vals.update({"fingerprint": False, "possible_duplicate": True})
+    else:
+        vals["fingerprint"] = fingerprint
+    return vals
+
+def robust_z_scores(groups, values, min_size=5):
+    """Modified z-score (0.6745 * (x - median) / MAD) of every value against the values of its own group.
+
+    groups and values are arrays of the same length; groups is an integer key per value. Everything is computed
+    with sorts over the whole arrays (no loop per group). Values of groups smaller than min_size, or with MAD 0,
+    get a score of 0.
+    """
+    groups = np.asarray(groups)
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return np.zeros(0)
+
+    def group_medians(data):
+        # Sort by group and then by value, the median is in the middle of every group slice
+        order = np.lexsort((data, groups))
+        keys, starts, counts = np.unique(groups[order], return_index=True, return_counts=True)
+        sorted_data = data[order]
+        medians = (sorted_data[starts + (counts - 1) // 2] + sorted_data[starts + counts // 2]) / 2
+        return np.searchsorted(keys, groups), medians, counts
+
+    position, medians, counts = group_medians(values)
+    median = medians[position]
+    _, mads, _ = group_medians(np.abs(values - median))
+    mad = mads[position]
+    valid = (counts[position] >= min_size) & (mad > 0)
+    scores = np.zeros(len(values))
+    scores[valid] = 0.6745 * (values[valid] - median[valid]) / mad[valid]
+    return scores
+
+def get_month_label(full_date):
+    """Groupable month of a date, in format YYYY-MM (e.g. 2025-03)."""
+    return f"{full_date.year}-{full_date.month:02d}"
+
+def get_quarter_label(full_date):
+    """Groupable quarter of a date, in format YYYY-TN (e.g. 2025-T1)."""
+    return f"{full_date.year}-T{(full_date.month - 1) // 3 + 1}"
+
+def fetch_latest_rates(base, symbols):
+    """Latest rates from base to every currency code in symbols, with ONE request to the exchange rate API.
+
+    Returns (rates date, {code: rate}). Codes unknown to the API are left out of the result.
+    """
+    URL = f"{RATE_API_URL}/latest?base={base}&symbols={','.join(symbols)}"
+
     try:
-         rate = requests.get(URL).json()["rates"][to_currency]
+        count_http_call()
+        data = requests.get(URL, timeout=RATE_API_TIMEOUT).json()
+        return data["date"], data["rates"]
     except requests.exceptions.RequestException as e:
-        raise UserError(f"Error al intentar convertir la cantidad a la moneda seleccionada. No se pudo obtener el tipo de cambio: {e}")
-    except KeyError:
-        raise UserError("Error al intentar convertir la cantidad a la moneda seleccionada. La respuesta de la API no contiene los datos esperados.")
-    
-    return amount * rate
\ No newline at end of file
+        raise UserError(f"No se pudo obtener el tipo de cambio: {e}")
+    except (KeyError, ValueError):
+        raise UserError("No se pudo obtener el tipo de cambio. La respuesta de la API no contiene los datos esperados.")
+
+def fetch_rate_series(base, symbols, date_from, date_to):
+    """Daily rates from base to every currency code in symbols between two dates, with ONE request to the
+    exchange rate API. Returns {date: {code: rate}} (only the days with published rates)."""
+    URL = f"{RATE_API_URL}/{date_from}..{date_to}?base={base}&symbols={','.join(symbols)}"
+
+    try:
+        count_http_call()
+        return requests.get(URL, timeout=RATE_API_TIMEOUT).json()["rates"]
+    except requests.exceptions.RequestException as e:
+        raise UserError(f"No se pudo obtener el histórico de tipos de cambio: {e}")
+    except (KeyError, ValueError):
+        raise UserError("No se pudo obtener el histórico de tipos de cambio. La respuesta de la API no contiene los datos esperados.")
+
+def sorted_by_value(data):
+    """Returns the dict sorted by value (higher first), or None if empty. Used for dashboard JSON stats."""
+    return dict(sorted(data.items(), key=lambda x: x[1], reverse=True)) if data else None
+
+def top1(sorted_data, name_key, value_key):
+    """First item of a dict already sorted by sorted_by_value, in format {name_key: name, value_key: value}."""
+    if sorted_data:
+        for key, value in sorted_data.items():
+            return {name_key: key, value_key: float(value)}
+    return {name_key: "(sin datos)", value_key: float(0.00)}
+
+def variation(current, last):
+    """Variation (in %) shown on the dashboard cards between current and last month values."""
+    difference = current - last
+    if not difference:
+        return float(0.00)
+    if last == 0:
+        return float(100.00)
+    if difference > 0:
+        return float(current / last * 100)
+    return float(current / last * 100 - 100)
@@ -0,0 +1,2 @@
+from . import movement_export
+from . import statement_import
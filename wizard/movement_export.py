@@ -0,0 +1,30 @@
+from odoo import fields, models
+from odoo.exceptions import ValidationError
+from urllib.parse import urlencode
+
+class MovementExport(models.TransientModel):
+    _name = "cashmind.movement_export"
+
+    date_from = fields.Date(string="Desde")
+    date_to = fields.Date(string="Hasta")
+    file_format = fields.Selection([
+        ("csv", "CSV"),
+        ("xlsx", "Excel (XLSX)"),
+        ], string="Formato", required=True, default="csv")
+
+    def action_export(self):
+        self.ensure_one()
+        if self.date_from and self.date_to and self.date_to < self.date_from:
+            raise ValidationError("La fecha final debe ser posterior a la fecha inicial.")
+
+        # The file is generated and streamed by the controller, this wizard only builds the URL
+        params = {"file_format": self.file_format}
+        if self.date_from:
+            params["date_from"] = fields.Date.to_string(self.date_from)
+        if self.date_to:
+            params["date_to"] = fields.Date.to_string(self.date_to)
+        return {
+            "type": "ir.actions.act_url",
+            "url": f"/cashmind/export/movements?{urlencode(params)}",
+            "target": "self",
+        }
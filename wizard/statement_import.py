@@ -0,0 +1,312 @@
+from odoo import fields, models, api
+from odoo.exceptions import ValidationError, UserError
+from collections import defaultdict
+from datetime import datetime
+from lxml import etree
+from ..utils import notification, update_balance, clean_input, movement_fingerprint, normalize_description
+import base64
+import csv
+import io
+import re
+
+import logging
+_logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000 # Rows validated and inserted at a time
+READ_SIZE = 64 * 1024 # Bytes read from the statement file at a time (OFX)
+
+
+# ------------- STATEMENT PARSERS (START) -------------
+# Every parser reads the file as a stream and yields one dict per movement:
+# {"date": date, "description": str, "amount": float} (amount < 0 for expenses, > 0 for incomes)
+def parse_amount(value, decimal_separator="."):
+    value = value.strip().replace(" ", "")
+    if decimal_separator == ",":
+        value = value.replace(".", "").replace(",", ".")
+    else:
+        value = value.replace(",", "")
+    return float(value)
+
+def parse_csv(file, delimiter, date_format, decimal_separator, date_column, description_column, amount_column):
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""), delimiter=delimiter)
+    missing = {date_column, description_column, amount_column} - set(reader.fieldnames or [])
+    if missing:
+        raise UserError(f"El archivo CSV no contiene las columnas: {', '.join(sorted(missing))}.")
+    for row in reader:
+        yield {
+            "date": datetime.strptime(row[date_column].strip(), date_format).date(),
+            "description": row[description_column],
+            "amount": parse_amount(row[amount_column], decimal_separator),
+        }
+
+def iter_ofx_tags(file):
+    """Yields (TAG, value) for every tag of an OFX (SGML or XML) file, reading it in small blocks."""
+    pending = ""
+    while True:
+        block = file.read(READ_SIZE)
+        if not block:
+            break
+        pending += block.decode("latin-1")
+        *tokens, pending = pending.split("<")
+        for token in tokens:
+            if ">" in token:
+                tag, _, value = token.partition(">")
+                yield tag.strip().upper(), value.strip()
+    if ">" in pending:
+        tag, _, value = pending.partition(">")
+        yield tag.strip().upper(), value.strip()
+
+def parse_ofx(file):
+    transaction = None
+    for tag, value in iter_ofx_tags(file):
+        if tag == "STMTTRN":
+            transaction = {}
+        elif tag == "/STMTTRN" and transaction is not None:
+            yield {
+                "date": datetime.strptime(transaction["DTPOSTED"][:8], "%Y%m%d").date(),
+                "description": transaction.get("NAME") or transaction.get("MEMO") or "",
+                "amount": parse_amount(transaction["TRNAMT"]),
+            }
+            transaction = None
+        elif transaction is not None and tag in ("DTPOSTED", "TRNAMT", "NAME", "MEMO") and value:
+            transaction[tag] = value
+
+def parse_camt053(file):
+    def text(entry, path):
+        found = entry.xpath(path)
+        return found[0].text.strip() if found and found[0].text else ""
+
+    for _, entry in etree.iterparse(file, events=("end",), tag="{*}Ntry"):
+        amount = parse_amount(text(entry, "./*[local-name()='Amt']"))
+        if text(entry, "./*[local-name()='CdtDbtInd']") == "DBIT":
+            amount = -amount
+        booking_date = (text(entry, "./*[local-name()='BookgDt']/*[local-name()='Dt']")
+                        or text(entry, "./*[local-name()='BookgDt']/*[local-name()='DtTm']")[:10])
+        description = (text(entry, ".//*[local-name()='RmtInf']/*[local-name()='Ustrd']")
+                       or text(entry, "./*[local-name()='AddtlNtryInf']"))
+        yield {
+            "date": datetime.strptime(booking_date, "%Y-%m-%d").date(),
+            "description": description,
+            "amount": amount,
+        }
+        # Free the parsed entries, so memory doesn't grow with the size of the file
+        entry.clear()
+        while entry.getprevious() is not None:
+            del entry.getparent()[0]
+# ------------- STATEMENT PARSERS (END) -------------
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class StatementImport(models.TransientModel):
+    _name = "cashmind.statement_import"
+
+    file = fields.Binary(string="Extracto bancario", required=True)
+    filename = fields.Char(string="Nombre del archivo")
+    file_format = fields.Selection([
+        ("csv", "CSV"),
+        ("ofx", "OFX"),
+        ("camt053", "CAMT.053 (XML)"),
+        ], string="Formato", required=True, default="csv")
+    account = fields.Many2one("cashmind.account", string="Cuenta", required=True, domain="[('user_id', '=', uid)]")
+    use_category_rules = fields.Boolean(string="Aplicar reglas de categorización", default=True)
+    expense_category = fields.Many2one("cashmind.category", string="Categoría de gastos", required=True,
+                                       domain="[('category_type', '!=', 'income'), ('user_id', '=', uid)]")
+    income_category = fields.Many2one("cashmind.category", string="Categoría de ingresos", required=True,
+                                      domain="[('category_type', '!=', 'expense'), ('user_id', '=', uid)]")
+    # CSV options
+    csv_delimiter = fields.Char(string="Separador", default=";")
+    csv_date_format = fields.Char(string="Formato de fecha", default="%d/%m/%Y")
+    csv_decimal_separator = fields.Selection([
+        (",", "Coma (1.234,56)"),
+        (".", "Punto (1,234.56)"),
+        ], string="Separador decimal", default=",")
+    csv_date_column = fields.Char(string="Columna de fecha", default="fecha")
+    csv_description_column = fields.Char(string="Columna de concepto", default="concepto")
+    csv_amount_column = fields.Char(string="Columna de importe", default="importe")
+    duplicate_mode = fields.Selection([
+        ("skip", "Omitir duplicados"),
+        ("flag", "Importar y marcar como posible duplicado"),
+        ], string="Movimientos ya importados", required=True, default="skip")
+    # Results
+    state = fields.Selection([("draft", "Borrador"), ("done", "Importado")], default="draft")
+    imported_income_count = fields.Integer(string="Ingresos importados", readonly=True)
+    imported_expense_count = fields.Integer(string="Gastos importados", readonly=True)
+    skipped_count = fields.Integer(string="Filas omitidas", readonly=True)
+    duplicate_count = fields.Integer(string="Duplicados detectados", readonly=True)
+
+    def _open_file(self):
+        """Binary file object of the uploaded statement (read from the filestore, without decoding it in memory)."""
+        attachment = self.env["ir.attachment"].sudo().search([
+            ("res_model", "=", self._name),
+            ("res_field", "=", "file"),
+            ("res_id", "=", self.id)], limit=1)
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), "rb")
+        return io.BytesIO(base64.b64decode(self.file))
+
+    def _parse(self, file):
+        if self.file_format == "ofx":
+            return parse_ofx(file)
+        if self.file_format == "camt053":
+            return parse_camt053(file)
+        return parse_csv(file, self.csv_delimiter or ";", self.csv_date_format or "%d/%m/%Y",
+                         self.csv_decimal_separator or ",", self.csv_date_column, self.csv_description_column,
+                         self.csv_amount_column)
+
+    def _base_name(self, description):
+        """Lowercase movement name from a statement description (only the signs allowed by clean_input)."""
+        name = re.sub(r"[^\w\s\-]", " ", description or "")
+        return clean_input(name, "title").lower()[:60] or "movimiento importado"
+
+    def _prepare_name(self, description, used_names):
+        """Valid and unique (for this user) movement name from the statement description."""
+        name = self._base_name(description)
+        candidate = name
+        counter = 2
+        while candidate in used_names:
+            candidate = f"{name} {counter}"
+            counter += 1
+        used_names.add(candidate)
+        return candidate.capitalize()
+
+    def _get_used_names(self, model, base_names):
+        """Lowercase names already used by this user in model that start with any of base_names (one query)."""
+        patterns = [name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%" for name in base_names]
+        self.env.cr.execute(f"""
+            SELECT lower(name) FROM {self.env[model]._table}
+            WHERE user_id = %s AND lower(name) LIKE ANY(%s)
+        """, (self.env.uid, patterns))
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    def _prepare_chunk(self, rows, used_names, occurrences):
+        """Validates a chunk of parsed rows and returns (incomes vals, expenses vals, skipped rows, duplicates).
+
+        occurrences counts the identical rows (same date, amount and normalized description) already seen in this
+        file, so two real identical movements get different fingerprints, while importing the same file twice
+        doesn't.
+        """
+        today = fields.Date.context_today(self)
+        incomes, expenses, skipped, duplicates = [], [], 0, 0
+
+        valid_rows = []
+        for row in rows:
+            if not row["amount"] or row["date"] > today:
+                skipped += 1
+                continue
+            # Same inputs as the fingerprint: rows that only differ in accents, case or signs are identical
+            key = (row["date"], round(float(row["amount"]), 2), normalize_description(row["description"]))
+            occurrences[key] += 1
+            row["model"] = "cashmind.income" if row["amount"] > 0 else "cashmind.expense"
+            row["fingerprint"] = movement_fingerprint(self.account.id, row["date"], row["amount"], row["description"],
+                                                      occurrences[key])
+            valid_rows.append(row)
+
+        # One set-based lookup per model for the whole chunk
+        existing = {}
+        for model in ("cashmind.income", "cashmind.expense"):
+            fingerprints = [row["fingerprint"] for row in valid_rows if row["model"] == model]
+            existing[model] = self.env[model]._get_existing_fingerprints(fingerprints) if fingerprints else set()
+
+        base_names = {self._base_name(row["description"]) for row in valid_rows}
+        for model in ("cashmind.income", "cashmind.expense"):
+            used_names[model] |= self._get_used_names(model, base_names)
+
+        # Rules compiled once per user (cached), the selected categories are used when no rule matches
+        matcher = self.env["cashmind.category_rule"]._get_matcher(self.env.uid) if self.use_category_rules else None
+
+        for row in valid_rows:
+            model = row["model"]
+            is_duplicate = row["fingerprint"] in existing[model]
+            if is_duplicate:
+                duplicates += 1
+                if self.duplicate_mode == "skip":
+                    continue
+            if model == "cashmind.income":
+                category, values, movement_type = self.income_category.id, incomes, "income"
+            else:
+                category, values, movement_type = self.expense_category.id, expenses, "expense"
+            if matcher:
+                category = matcher.match(row["description"], row["amount"], self.account.id, movement_type) or category
+            values.append({
+                "user_id": self.env.uid,
+                "name": self._prepare_name(row["description"], used_names[model]),
+                "account": self.account.id,
+                "category": category,
+                "amount": abs(row["amount"]),
+                "date": row["date"],
+                "note": "Importado desde extracto bancario",
+                # Flagged duplicates keep no fingerprint (it's unique per user)
+                "fingerprint": row["fingerprint"] if not is_duplicate else False,
+                "possible_duplicate": is_duplicate,
+            })
+        return incomes, expenses, skipped, duplicates
+
+    def action_import(self):
+        self.ensure_one()
+        if self.income_category.category_type == "expense" or self.expense_category.category_type == "income":
+            raise ValidationError("Las categorías seleccionadas no son válidas para ingresos y gastos.")
+
+        account = self.account
+        delta = 0.00 # Net change of the account balance, applied once at the end
+        income_count = expense_count = skipped = duplicate_count = 0
+        used_names = defaultdict(set)
+        occurrences = defaultdict(int)
+
+        with self._open_file() as file:
+            try:
+                for rows in chunked(self._parse(file), IMPORT_CHUNK_SIZE):
+                    incomes, expenses, chunk_skipped, chunk_duplicates = self._prepare_chunk(rows, used_names, occurrences)
+                    if incomes:
+                        self.env["cashmind.income"]._create_batch(incomes)
+                    if expenses:
+                        self.env["cashmind.expense"]._create_batch(expenses)
+                    delta += sum(v["amount"] for v in incomes) - sum(v["amount"] for v in expenses)
+                    income_count += len(incomes)
+                    expense_count += len(expenses)
+                    skipped += chunk_skipped
+                    duplicate_count += chunk_duplicates
+
+                    # Keep memory bounded: send the chunk to the database and forget the created records
+                    self.env.flush_all()
+                    self.env.invalidate_all()
+            except (ValueError, KeyError, etree.XMLSyntaxError) as e:
+                raise UserError(f"No se pudo leer el extracto bancario. Revise el formato del archivo: {e}")
+
+        if delta:
+            update_balance(account, delta)
+
+        # Recalculate dashboard stats
+        dashboards = self.env['cashmind.dashboard'].search([('user_id', '=', self.env.uid)])
+        dashboards.recalculate_dashboard()
+        if income_count or expense_count:
+            # The month stats only depend on the totals: a balanced statement (as much income as expenses)
+            # doesn't change them, so they are recomputed explicitly
+            self.env.add_to_compute(dashboards._fields["total_income_month"], dashboards)
+
+        notification(self, "Extracto importado",
+                     f"Se importaron {income_count} ingresos y {expense_count} gastos.",
+                     "success")
+        self.write({
+            "state": "done",
+            "imported_income_count": income_count,
+            "imported_expense_count": expense_count,
+            "skipped_count": skipped,
+            "duplicate_count": duplicate_count,
+        })
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "new",
+        }